@@ -0,0 +1,6 @@
+import os
+import sys
+
+# the bot imports `lib` from its own folder and `common` from the repository root
+CURRENT_PATH = os.path.abspath(os.path.dirname(__file__))
+sys.path[:0] = [CURRENT_PATH, os.path.dirname(CURRENT_PATH)]
@@ -88,6 +88,10 @@ class InfoBot(ChatManager):
                 self.logger.warning(f"{operator['name']}({operator['id']}) has no permission to add announcement bot.")
                 return
 
+            # the bot is back in the chat, so deliveries can reach it again
+            if self.tools.release_chat(new_chat.id):
+                self.logger.info(f"Release {new_chat.name}({new_chat.id}) from quarantine")
+
             if chat_info.count_documents(filter_) == 0:
                 chat_info.insert_one(new_chat.__dict__)
                 self.logger.info(
@@ -4,14 +4,17 @@ import hashlib
 import json
 import logging
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 
 import pandas as pd
 import pygsheets as pg
 import pymongo as pm
 import requests as rq
-from beautifultable import BeautifulTable
 from telegram import Bot, Update
+from telegram.error import BadRequest, ChatMigrated, Forbidden
+
+from common.sheets import SheetSession
+from common.table import pre_table
 
 
 def init_args(parser: argparse.ArgumentParser):
@@ -92,185 +95,150 @@ class Permission:
         self.update_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
 
-class Announcement:
-    FIXED_COLUMNS = ["id", "create_time", "creator", "creator_id"]
-
-    def __init__(
-        self,
-        id: str,
-        operation: str,
-        create_time: datetime,
-        creator: str,
-        creator_id: str,
-        category: str = None,
-        language: str = None,
-        labels: list = None,
-        chats: list = None,
-        content_type: str = None,
-        content_text: str = None,
-        content_html: str = None,
-        file_path: str = None,
-        available_chats: list = None,
-        approved_time: datetime = None,
-        approver: str = None,
-        approver_id: str = None,
-        record: list = None,
-        status: str = None,
-    ):
-        self.id = id
-        self.operation = operation
-        self.create_time = create_time
-        self.creator = creator
-        self.creator_id = str(creator_id)
-        self.category = category
-        self.language = language
-        self.labels = labels
-        self.chats = chats
-        self.content_text = content_text
-        self.content_html = content_html
-        self.content_type = content_type
-        self.file_path = file_path
-        self.available_chats = available_chats
-        self.approved_time = approved_time
-        self.approver = approver
-        self.approver_id = str(approver_id) if approver_id else None
-        self.record = record
-        self.status = status
-
-    def update(self, **kwargs):
+class Record:
+    """
+    Base of the tickets saved in AnnouncementDB.Announcement.
+    FIELDS maps every field to its type, values are validated once when they are set and None is always allowed.
+    Subclasses must declare the same names in __slots__.
+    """
 
-        for k, v in kwargs.items():
-            if k in self.__dict__ and k not in self.FIXED_COLUMNS:
-                setattr(self, k, v)
-            else:
-                print(f"Unknow param of Announcement: {k}")
-
-
-class EditTicket:
+    __slots__ = ()
+    FIELDS = {}
+    REQUIRED = ["id", "create_time", "creator", "creator_id"]
     FIXED_VALUES = ["id", "create_time", "creator", "creator_id"]
 
-    def __init__(
-        self,
-        id: str,
-        operation: str,
-        create_time: datetime,
-        creator: str,
-        creator_id: str,
-        original_id: str = None,
-        content_type: str = None,
-        original_content_text: str = None,
-        original_content_html: str = None,
-        new_content_text: str = None,
-        new_content_html: str = None,
-        available_chats: list = None,
-        approved_time: datetime = None,
-        approver: str = None,
-        approver_id: str = None,
-        status: str = None,
-    ) -> None:
-        self.id = id
-        self.operation = operation
-        self.create_time = create_time
-        self.creator = creator
-        self.creator_id = str(creator_id)
-        self.original_id = original_id
-        self.content_type = content_type
-        self.original_content_text = original_content_text
-        self.original_content_html = original_content_html
-        self.new_content_text = new_content_text
-        self.new_content_html = new_content_html
-        self.available_chats = available_chats
-        self.approved_time = approved_time
-        self.approver = approver
-        self.approver_id = str(approver_id) if approver_id else None
-        self.status = status
-
-    def update(self, **kwargs):
-        for k, v in kwargs.items():
-            if k in self.__dict__ and k not in self.FIXED_VALUES:
-                setattr(self, k, v)
-            else:
-                print(f"Unknow param of EditTicket: {k}")
+    def __init__(self, **kwargs):
+        missing = [k for k in self.REQUIRED if k not in kwargs]
+        if missing:
+            raise TypeError(f"{type(self).__name__} missing required fields: {missing}")
 
+        for k in self.FIELDS:
+            setattr(self, k, kwargs.pop(k, None))
 
-class DeleteTicket:
-    FIXED_VALUES = ["id", "create_time", "creator", "creator_id"]
-
-    def __init__(
-        self,
-        id: str,
-        operation: str,
-        create_time: datetime,
-        creator: str,
-        creator_id: str,
-        original_id: str = None,
-        content_type: str = None,
-        original_content_text: str = None,
-        original_content_html: str = None,
-        available_chats: list = None,
-        approved_time: datetime = None,
-        approver: str = None,
-        approver_id: str = None,
-        status: str = None,
-    ) -> None:
-        self.id = id
-        self.operation = operation
-        self.create_time = create_time
-        self.creator = creator
-        self.creator_id = str(creator_id)
-        self.original_id = original_id
-        self.content_type = content_type
-        self.original_content_text = original_content_text
-        self.original_content_html = original_content_html
-        self.available_chats = available_chats
-        self.approved_time = approved_time
-        self.approver = approver
-        self.approver_id = str(approver_id) if approver_id else None
-        self.status = status
+        if kwargs:
+            raise ValueError(f"Unknown fields of {type(self).__name__}: {list(kwargs)}")
 
-    def update(self, **kwargs):
-        for k, v in kwargs.items():
-            if k in self.__dict__ and k not in self.FIXED_VALUES:
-                setattr(self, k, v)
-            else:
-                print(f"Unknow param of DeleteTicket: {k}")
+    def __setattr__(self, k: str, v: any):
+        if k not in self.FIELDS:
+            raise ValueError(f"Unknown field of {type(self).__name__}: {k}")
 
+        type_ = self.FIELDS[k]
+        if v is None or isinstance(v, type_):
+            pass
+        elif type_ is str and isinstance(v, int):  # telegram ids are int, stored as str
+            v = str(v)
+        else:
+            raise TypeError(f"{type(self).__name__}.{k} expects {type_.__name__}, got {type(v).__name__}")
+        object.__setattr__(self, k, v)
 
-class ChangePermissionTicker:
-    FIXED_VALUES = ["id", "create_time", "creator", "creator_id"]
-
-    def __init__(
-        self,
-        id: str,
-        create_time: datetime,
-        creator: str,
-        creator_id: str,
-        operation: str = None,
-        affected_user_id: str = None,
-        affected_user: str = None,
-        approved_time: datetime = None,
-        approver: str = None,
-        approver_id: str = None,
-        status: str = None,
-    ):
-        self.id = id
-        self.create_time = create_time
-        self.creator = creator
-        self.creator_id = creator_id
-        self.operation = operation
-        self.approved_time = approved_time
-        self.affected_user_id = affected_user_id
-        self.affected_user = affected_user
-        self.approver = approver
-        self.approver_id = approver_id
-        self.status = status
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(id={self.id!r})"
 
     def update(self, **kwargs):
+        fixed = [k for k in kwargs if k in self.FIXED_VALUES]
+        if fixed:
+            raise ValueError(f"Fixed fields of {type(self).__name__} can not be updated: {fixed}")
+
         for k, v in kwargs.items():
-            if k in self.__dict__ and k not in self.FIXED_VALUES:
-                setattr(self, k, v)
-            else:
-                print(f"Unknow param of ChangePermissionTicker: {k}")
+            setattr(self, k, v)
+
+    def to_document(self, exclude: list = None) -> dict:
+        return {k: getattr(self, k) for k in self.FIELDS if not exclude or k not in exclude}
+
+    @classmethod
+    def from_document(cls, document: dict):
+        return cls(**{k: v for k, v in document.items() if k != "_id"})
+
+    @classmethod
+    def projection(cls) -> dict:
+        return {"_id": 0, **{k: 1 for k in cls.FIELDS}}
+
+
+class Announcement(Record):
+    FIELDS = {
+        "id": str,
+        "operation": str,
+        "create_time": datetime,
+        "creator": str,
+        "creator_id": str,
+        "category": str,
+        "language": str,
+        "labels": list,
+        "chats": list,
+        "content_type": str,
+        "content_text": str,
+        "content_html": str,
+        "file_path": str,
+        "available_chats": list,
+        "approved_time": datetime,
+        "approver": str,
+        "approver_id": str,
+        "record": list,
+        "status": str,
+    }
+    __slots__ = tuple(FIELDS)
+    REQUIRED = ["id", "operation", "create_time", "creator", "creator_id"]
+
+
+class EditTicket(Record):
+    FIELDS = {
+        "id": str,
+        "operation": str,
+        "create_time": datetime,
+        "creator": str,
+        "creator_id": str,
+        "original_id": str,
+        "content_type": str,
+        "original_content_text": str,
+        "original_content_html": str,
+        "new_content_text": str,
+        "new_content_html": str,
+        "available_chats": list,
+        "approved_time": datetime,
+        "approver": str,
+        "approver_id": str,
+        "status": str,
+    }
+    __slots__ = tuple(FIELDS)
+    REQUIRED = ["id", "operation", "create_time", "creator", "creator_id"]
+
+
+class DeleteTicket(Record):
+    FIELDS = {
+        "id": str,
+        "operation": str,
+        "create_time": datetime,
+        "creator": str,
+        "creator_id": str,
+        "original_id": str,
+        "content_type": str,
+        "original_content_text": str,
+        "original_content_html": str,
+        "available_chats": list,
+        "approved_time": datetime,
+        "approver": str,
+        "approver_id": str,
+        "status": str,
+    }
+    __slots__ = tuple(FIELDS)
+    REQUIRED = ["id", "operation", "create_time", "creator", "creator_id"]
+
+
+class ChangePermissionTicker(Record):
+    FIELDS = {
+        "id": str,
+        "create_time": datetime,
+        "creator": str,
+        "creator_id": str,
+        "operation": str,
+        "affected_user_id": str,
+        "affected_user": str,
+        "approved_time": datetime,
+        "approver": str,
+        "approver_id": str,
+        "status": str,
+    }
+    __slots__ = tuple(FIELDS)
 
 
 class Tools:
@@ -360,11 +328,40 @@ class Tools:
 
     ESCAPE_CHARACTERS = [".", "!", "|"]
 
+    # a chat info sheet read this recent is reused by the upload right after a download
+    SHEET_CACHE_AGE = 60
+
+    # failed-delivery retry queue, delay of attempt n is RETRY_BASE_DELAY * 2 ** (n - 1) seconds
+    RETRY_MAX_ATTEMPTS = 5
+    RETRY_BASE_DELAY = 60
+    RETRY_MAX_DELAY = 3600
+    RETRY_MAX_CHATS_PER_SWEEP = 200
+    RETRY_BATCH_INTERVAL = 1
+
+    # chats failing with a permanent error this many times in a row are excluded from fan-out
+    QUARANTINE_THRESHOLD = 3
+    PERMANENT_ERROR_MESSAGES = [
+        "chat not found",
+        "bot was kicked",
+        "bot is not a member",
+        "bot was blocked",
+        "group chat was deactivated",
+        "user is deactivated",
+        "have no rights to send a message",
+        "need administrator rights",
+    ]
+
+    # per-chat delivery lists live in AnnouncementDB.DeliveryRecords, split into buckets of this size
+    DELIVERY_FIELDS = ["available_chats", "record"]
+    DELIVERY_BUCKET_SIZE = 500
+
     def __init__(self):
         self.config = self.init_config()
         self.mongo_client = self.init_mongo_client()
         self.gc_client = self.init_gc_client()
+        self.sheets = SheetSession(self.gc_client)
         self.permission = self.init_collection("AnnouncementDB", "Permissions")
+        self.delivery_records = self.init_delivery_records()
         self.logger = None
 
         self.update_columns_map()
@@ -390,6 +387,14 @@ class Tools:
     def init_collection(self, db_name: str, collection_name: str) -> pm.collection.Collection:
         return self.mongo_client[db_name][collection_name]
 
+    def init_delivery_records(self) -> pm.collection.Collection:
+        collection = self.init_collection("AnnouncementDB", "DeliveryRecords")
+        collection.create_index(
+            [("annc_id", pm.ASCENDING), ("kind", pm.ASCENDING), ("bucket", pm.ASCENDING)], unique=True
+        )
+        collection.create_index([("annc_id", pm.ASCENDING), ("chats.id", pm.ASCENDING)])
+        return collection
+
     def in_whitelist(self, id: any) -> bool:
         filter_ = {"id": str(id)}
         result = self.permission.find(filter_)
@@ -412,17 +417,14 @@ class Tools:
     def init_chatinfo(self) -> pd.DataFrame:
         return pd.read_csv(self.OLD_CHAT_INFO_PATH, index_col=None)
 
-    def init_online_sheet(self, url: str, name: str, to_type: str = "df") -> pd.DataFrame:
-        ws = self.gc_client.open_by_url(url)
-        sheet_names = [i.title for i in ws.worksheets()]
-
+    def init_online_sheet(self, url: str, name: str, to_type: str = "df", max_age: float = 0) -> pd.DataFrame:
+        """
+        param max_age: seconds a previous read of the same sheet can be reused, only for to_type 'df'
+        """
         if to_type == "df":
-            if name not in sheet_names:
-                return pd.DataFrame()
-            else:
-                return ws.worksheet_by_title(name).get_as_df()
+            return self.sheets.read_frame(url, name, max_age=max_age)
         else:
-            return ws.worksheet_by_title(name)
+            return self.sheets.worksheet(url, name)
 
     def update_columns_map(self):
         return NotImplemented
@@ -503,7 +505,6 @@ class Tools:
                    will be run when bot been added new chat or left chat or chat name changed
         3. init: init online sheet from mongoDB, online DB only have columns name
         """
-        online_chat_info = self.init_online_sheet(self.ONLINE_CHAT_INFO_URL, self.ONLIN_CHAT_INFO_TABLE_NAME)
         chat_info = self.init_collection("AnnouncementDB", "ChatInfo")
 
         if update_type == "init":
@@ -515,13 +516,13 @@ class Tools:
             chat_info = chat_info[list(self.CHAT_INFO_COLUMNS_MAP.values())]
 
             # write chat_info to online sheet
-            ws = self.init_online_sheet(self.ONLINE_CHAT_INFO_URL, self.ONLIN_CHAT_INFO_TABLE_NAME, to_type="ws")
-            ws.set_dataframe(chat_info, (1, 1))
+            self.sheets.write_frame(self.ONLINE_CHAT_INFO_URL, self.ONLIN_CHAT_INFO_TABLE_NAME, chat_info)
             self.logger.info("Init online sheet from mongoDB successfully")
             return
 
         # In current method, if an category was deleted, it will be deleted in mongoDB
         elif update_type == "download":
+            online_chat_info = self.init_online_sheet(self.ONLINE_CHAT_INFO_URL, self.ONLIN_CHAT_INFO_TABLE_NAME)
             missing_columns = ["id", "update_time", "operator", "operator_id"]
             for _, row in online_chat_info.iterrows():
                 inputs = {self.get_columns_name(key, "cr"): value for key, value in row.items()}
@@ -557,15 +558,16 @@ class Tools:
             online_columns.remove("Others")
             chat_info = chat_info[online_columns]
 
+            online_chat_info = self.init_online_sheet(
+                self.ONLINE_CHAT_INFO_URL, self.ONLIN_CHAT_INFO_TABLE_NAME, max_age=self.SHEET_CACHE_AGE
+            )
             original_labels_order = online_chat_info["Labels"].unique().tolist()
 
             chat_info = chat_info.sort_values(
                 by="Labels", key=lambda x: x.map({label: i for i, label in enumerate(original_labels_order)})
             )
 
-            ws = self.init_online_sheet(self.ONLINE_CHAT_INFO_URL, self.ONLIN_CHAT_INFO_TABLE_NAME, to_type="ws")
-            ws.clear()
-            ws.set_dataframe(chat_info, (1, 1))
+            self.sheets.write_frame(self.ONLINE_CHAT_INFO_URL, self.ONLIN_CHAT_INFO_TABLE_NAME, chat_info, clear=True)
             self.logger.info("Upload mongoDB to online sheet successfully")
 
     def handle_operator(self, update: Update) -> dict:
@@ -632,6 +634,7 @@ class Tools:
 
     def get_chat_by_announcement(self, annc: Announcement) -> list:
         chat_info = self.init_collection("AnnouncementDB", "ChatInfo")
+        quarantined = self.get_quarantined_chat_ids()
 
         chat_list = []
         if annc.category != "others":
@@ -639,7 +642,7 @@ class Tools:
             chats = chat_info.find(filter_)
             for chat in chats:
                 inputs = {"id": chat["id"], "name": chat["name"]}
-                if inputs not in chat_list:
+                if inputs not in chat_list and chat["id"] not in quarantined:
                     chat_list.append(inputs)
 
         elif annc.labels or annc.chats:
@@ -648,14 +651,14 @@ class Tools:
                 chats = chat_info.find(filter_)
                 for chat in chats:
                     inputs = {"id": chat["id"], "name": chat["name"]}
-                    if inputs not in chat_list:
+                    if inputs not in chat_list and chat["id"] not in quarantined:
                         chat_list.append(inputs)
 
             for i in annc.chats:
                 filter_ = {"name": i}
                 chat = chat_info.find_one(filter_)
                 inputs = {"id": chat["id"], "name": chat["name"]}
-                if inputs not in chat_list:
+                if inputs not in chat_list and chat["id"] not in quarantined:
                     chat_list.append(inputs)
 
         return chat_list
@@ -668,7 +671,7 @@ class Tools:
                 f"<b>Creator:</b> {annc.creator}\n"
                 f"<b>Category:</b> <code>{self.get_columns_name(annc.category, 'cl')}</code>\n"
                 f"<b>Language:</b> <code>{self.get_columns_name(annc.language, 'al')}</code>\n"
-                f"<b>Chat numbers:</b> {len(annc.available_chats)}\n"
+                f"<b>Chat numbers:</b> {self.get_chat_number(annc)}\n"
                 f"<a> Please check the announcement content in the next message.</a>"
             )
         else:
@@ -676,7 +679,7 @@ class Tools:
                 f"<b>[Confirm Message]</b>\n\n"
                 f"<b>ID:</b> <code>{annc.id}</code>\n"
                 f"<b>Creator:</b> {annc.creator}\n"
-                f"<b>Chat numbers:</b> {len(annc.available_chats)}\n"
+                f"<b>Chat numbers:</b> {self.get_chat_number(annc)}\n"
                 f"<a> Please check the announcement content in the next message.</a>"
             )
 
@@ -688,7 +691,7 @@ class Tools:
             f"<b>ID:</b> <code>{ticket.id}</code>\n"
             f"<b>Annc ID:</b> <code>{ticket.original_id}</code>\n"
             f"<b>Creator:</b> {ticket.creator}\n"
-            f"<b>Chat numbers:</b> {len(ticket.available_chats)}\n"
+            f"<b>Chat numbers:</b> {self.get_chat_number(ticket)}\n"
             f"<b>Original Contents:</b>\n\n"
             f"{ticket.original_content_html}\n\n"
             f"<b>New Contents:</b>\n\n"
@@ -703,7 +706,7 @@ class Tools:
             f"<b>ID:</b> <code>{ticket.id}</code>\n"
             f"<b>Annc ID:</b> <code>{ticket.original_id}</code>\n"
             f"<b>Creator:</b> {ticket.creator}\n"
-            f"<b>Chat numbers:</b> {len(ticket.available_chats)}\n"
+            f"<b>Chat numbers:</b> {self.get_chat_number(ticket)}\n"
             f"Please check the announcement be deleted in the next message."
         )
 
@@ -720,7 +723,7 @@ class Tools:
                     f"<b>Operator:</b> {annc.approver}\n"
                     f"<b>Category:</b> <code>{self.get_columns_name(annc.category, 'cl')}</code>\n"
                     f"<b>Language:</b> <code>{self.get_columns_name(annc.language, 'al')}</code>\n"
-                    f"<b>Chat numbers:</b> {len(annc.available_chats)}\n"
+                    f"<b>Chat numbers:</b> {self.get_chat_number(annc)}\n"
                 )
             else:
                 message = (
@@ -729,7 +732,7 @@ class Tools:
                     f"<b>ID:</b> {annc.id}\n"
                     f"<b>Creator:</b> {annc.creator}\n"
                     f"<b>Operator:</b> {annc.approver}\n"
-                    f"<b>Chat numbers:</b> {len(annc.available_chats)}\n"
+                    f"<b>Chat numbers:</b> {self.get_chat_number(annc)}\n"
                 )
         elif isinstance(annc, EditTicket):
             message = (
@@ -739,7 +742,7 @@ class Tools:
                 f"<b>Annc ID:</b> <code>{annc.original_id}</code>\n"
                 f"<b>Creator:</b> {annc.creator}\n"
                 f"<b>Operator:</b> {annc.approver}\n"
-                f"<b>Chat numbers:</b> {len(annc.available_chats)}\n"
+                f"<b>Chat numbers:</b> {self.get_chat_number(annc)}\n"
                 f"<b>Original Contents:</b>\n\n"
                 f"{annc.original_content_html}\n\n"
                 f"<b>New Contents:</b>\n\n"
@@ -753,7 +756,7 @@ class Tools:
                 f"<b>Annc ID:</b> <code>{annc.original_id}</code>\n"
                 f"<b>Creator:</b> {annc.creator}\n"
                 f"<b>Operator:</b> {annc.approver}\n"
-                f"<b>Chat numbers:</b> {len(annc.available_chats)}\n"
+                f"<b>Chat numbers:</b> {self.get_chat_number(annc)}\n"
             )
         else:
             self.logger.warning(f"Unknow type of annc: {type(annc)}")
@@ -764,22 +767,42 @@ class Tools:
             return await method(**inputs)
         except Exception as e:
             self.logger.warning(f"Post message failed sending to {inputs['chat_id']}: {e}")
-            return {"status": "failed", "chat_id": inputs["chat_id"], "error_message": f"{e}"}
+            return {
+                "status": "failed",
+                "chat_id": inputs["chat_id"],
+                "error_message": f"{e}",
+                "permanent": self.is_permanent_error(e),
+            }
+
+    def is_permanent_error(self, e: Exception) -> bool:
+        if isinstance(e, (Forbidden, ChatMigrated)):
+            return True
+        if isinstance(e, BadRequest):
+            message = str(e).lower()
+            return any(i in message for i in self.PERMANENT_ERROR_MESSAGES)
+        return False
 
-    async def post_annc(self, annc: Announcement, bot: Bot):
+    async def post_annc(self, annc: Announcement, bot: Bot, chats: list = None, interval: float = 0):
+        """
+        param chats: subset of annc.available_chats to send to, default is all of them
+        param interval: seconds to wait between two batches, used to stay under the telegram rate limit
+        """
         method_map = {
             "photo": bot.send_photo,
             "video": bot.send_video,
             "document": bot.send_document,
             "text": bot.send_message,
         }
+        chats = annc.available_chats if chats is None else chats
         num_per_batch = 20
-        num_of_batch = len(annc.available_chats) // num_per_batch + 1
+        num_of_batch = len(chats) // num_per_batch + 1
         results = []
         for i in range(num_of_batch):
+            if i > 0 and interval:
+                await asyncio.sleep(interval)
 
             tasks = []
-            for chat in annc.available_chats[i * num_per_batch : (i + 1) * num_per_batch]:
+            for chat in chats[i * num_per_batch : (i + 1) * num_per_batch]:
                 if annc.content_type == "text":
                     inputs = {
                         "chat_id": chat["id"],
@@ -809,6 +832,8 @@ class Tools:
 
         tasks = []
         for chat in ticket.available_chats:
+            if chat["message_id"] == "Failed":
+                continue
             if ticket.content_type == "text":
                 inputs = {
                     "chat_id": chat["id"],
@@ -823,19 +848,77 @@ class Tools:
                     "caption": ticket.new_content_html,
                     "parse_mode": "HTML",
                 }
-            task = asyncio.create_task(method_map[ticket.content_type](**inputs))
+            task = asyncio.create_task(self.post(method_map[ticket.content_type], inputs))
             tasks.append(task)
 
-        await asyncio.gather(*tasks)
+        return await asyncio.gather(*tasks)
 
     async def delete_annc(self, ticket: DeleteTicket, bot: Bot):
         tasks = []
 
         for chat in ticket.available_chats:
-            task = asyncio.create_task(bot.delete_message(chat["id"], chat["message_id"]))
+            if chat["message_id"] == "Failed":
+                continue
+            inputs = {"chat_id": chat["id"], "message_id": chat["message_id"]}
+            task = asyncio.create_task(self.post(bot.delete_message, inputs))
             tasks.append(task)
 
-        await asyncio.gather(*tasks)
+        return await asyncio.gather(*tasks)
+
+    def update_chat_health(self, chats: list, results: list) -> list:
+        """
+        Track delivery health in AnnouncementDB.ChatHealth from the results of post_annc, edit_annc or delete_annc.
+        param chats: the chats the results were sent to, in the same order, chats marked as Failed are skipped
+        return: chats newly quarantined by this update
+        """
+        chat_health = self.init_collection("AnnouncementDB", "ChatHealth")
+        chats = [i for i in chats if i.get("message_id") != "Failed"]
+
+        now = datetime.now()
+        quarantined = []
+        for chat, result in zip(chats, results):
+            filter_ = {"id": str(chat["id"])}
+            if not isinstance(result, dict):
+                update_ = {"$set": {"name": chat["name"], "consecutive_failures": 0, "last_success_time": now}}
+                chat_health.update_one(filter_, update_, upsert=True)
+                continue
+
+            if not result.get("permanent"):
+                continue
+
+            update_ = {
+                "$set": {"name": chat["name"], "last_error": result["error_message"], "last_error_time": now},
+                "$inc": {"consecutive_failures": 1},
+            }
+            health = chat_health.find_one_and_update(
+                filter_, update_, upsert=True, return_document=pm.ReturnDocument.AFTER
+            )
+            if health["consecutive_failures"] >= self.QUARANTINE_THRESHOLD and not health.get("quarantined"):
+                chat_health.update_one(filter_, {"$set": {"quarantined": True, "quarantine_time": now}})
+                quarantined.append(health)
+                self.logger.warning(
+                    f"Chat {health['name']}({health['id']}) quarantined after "
+                    f"{health['consecutive_failures']} permanent errors: {health['last_error']}"
+                )
+        return quarantined
+
+    def get_quarantined_chat_ids(self) -> set:
+        chat_health = self.init_collection("AnnouncementDB", "ChatHealth")
+        return {i["id"] for i in chat_health.find({"quarantined": True}, {"id": 1})}
+
+    def release_chat(self, id: any) -> bool:
+        chat_health = self.init_collection("AnnouncementDB", "ChatHealth")
+        filter_ = {"id": str(id), "quarantined": True}
+        update_ = {"$set": {"quarantined": False, "consecutive_failures": 0}}
+        return chat_health.update_one(filter_, update_).modified_count == 1
+
+    def get_quarantine_message(self, chats: list) -> str:
+        lines = [f"{i['name']} (<code>{i['id']}</code>): {i['last_error']}" for i in chats]
+        return (
+            f"<b>[Quarantine Message]</b>\n\n"
+            f"The following chats failed {self.QUARANTINE_THRESHOLD} times in a row and will be skipped "
+            f"in future announcements, use /release_chat to restore them:\n\n" + "\n".join(lines)
+        )
 
     async def save_file(self, id: str, bot: Bot) -> dict:
         if id == "":
@@ -892,48 +975,262 @@ class Tools:
             )
         return parsed_result
 
-    def input_annc_record(self, annc: Announcement) -> None:
+    def get_retry_delay(self, attempts: int) -> timedelta:
+        return timedelta(seconds=min(self.RETRY_BASE_DELAY * 2 ** max(attempts - 1, 0), self.RETRY_MAX_DELAY))
+
+    def enqueue_failed_chats(self, annc: Announcement) -> int:
+        """
+        Put every failed chat of the announcement into AnnouncementDB.RetryQueue,
+        return the number of chats waiting for retry
+        """
+        retry_queue = self.init_collection("AnnouncementDB", "RetryQueue")
+        failed_chats = [i for i in annc.record or [] if i["message_id"] == "Failed"]
+        names = {str(i["id"]): i["name"] for i in annc.available_chats or []}
+
+        now = datetime.now()
+        for chat in failed_chats:
+            chat_id = str(chat["id"])
+            filter_ = {"annc_id": annc.id, "chat_id": chat_id}
+            update_ = {
+                "$set": {"name": names.get(chat_id, chat["name"]), "error_message": chat.get("error_message")},
+                "$setOnInsert": {
+                    "attempts": 0,
+                    "status": "pending",
+                    "create_time": now,
+                    "next_retry_time": now + self.get_retry_delay(1),
+                },
+            }
+            retry_queue.update_one(filter_, update_, upsert=True)
+
+        if failed_chats:
+            self.logger.info(f"Announcement {annc.id} has {len(failed_chats)} failed chats queued for retry")
+        return len(failed_chats)
+
+    def mark_annc_deleted(self, annc_id: str) -> int:
+        """
+        Set a deleted announcement to status `deleted` and cancel its pending retries, so the retry sweep does not
+        post it again, return the number of retries cancelled
+        """
         annc_records = self.init_collection("AnnouncementDB", "Announcement")
-        annc_records.insert_one(annc.__dict__)
+        annc_records.update_one({"id": str(annc_id), "operation": "post"}, {"$set": {"status": "deleted"}})
 
-    def input_edit_record(self, ticket: EditTicket) -> None:
+        retry_queue = self.init_collection("AnnouncementDB", "RetryQueue")
+        filter_ = {"annc_id": str(annc_id), "status": "pending"}
+        return retry_queue.update_many(filter_, {"$set": {"status": "cancelled"}}).modified_count
+
+    async def retry_failed_annc(self, bot: Bot, force: bool = False) -> dict:
+        """
+        Re-send announcements to the failed chats in AnnouncementDB.RetryQueue, quarantined chats are cancelled.
+        param force: ignore next_retry_time and retry every pending chat
+        return: {annc_id: {"success": int, "failed": int, "abandoned": int, "quarantined": list}}
+        """
+        retry_queue = self.init_collection("AnnouncementDB", "RetryQueue")
+
+        now = datetime.now()
+        filter_ = {"status": "pending"}
+        if not force:
+            filter_["next_retry_time"] = {"$lte": now}
+        jobs = list(
+            retry_queue.find(filter_).sort("next_retry_time", pm.ASCENDING).limit(self.RETRY_MAX_CHATS_PER_SWEEP)
+        )
+
+        quarantined = self.get_quarantined_chat_ids()
+        for job in [i for i in jobs if i["chat_id"] in quarantined]:
+            retry_queue.update_one({"_id": job["_id"]}, {"$set": {"status": "cancelled"}})
+        jobs = [i for i in jobs if i["chat_id"] not in quarantined]
+
+        jobs_by_annc = {}
+        for job in jobs:
+            jobs_by_annc.setdefault(job["annc_id"], []).append(job)
+
+        summary = {}
+        for annc_id, annc_jobs in jobs_by_annc.items():
+            annc = self.get_annc_by_id(annc_id)
+            if annc is None or annc.status != "approved":
+                retry_queue.update_many({"annc_id": annc_id}, {"$set": {"status": "cancelled"}})
+                self.logger.warning(f"Announcement {annc_id} is not approved anymore, retry cancelled")
+                continue
+
+            chats = [{"id": job["chat_id"], "name": job["name"]} for job in annc_jobs]
+            result = await self.post_annc(annc, bot, chats=chats, interval=self.RETRY_BATCH_INTERVAL)
+            parsed_result = self.parse_annc_result(result)
+            newly_quarantined = self.update_chat_health(chats, result)
+
+            for res in parsed_result:
+                if res["message_id"] != "Failed":
+                    self.update_delivery_record(annc.id, res)
+
+            summary[annc_id] = {"success": 0, "failed": 0, "abandoned": 0, "quarantined": newly_quarantined}
+            for job, res in zip(annc_jobs, parsed_result):
+                filter_ = {"_id": job["_id"]}
+                attempts = job["attempts"] + 1
+                if res["message_id"] != "Failed":
+                    retry_queue.update_one(filter_, {"$set": {"status": "success", "attempts": attempts}})
+                    summary[annc_id]["success"] += 1
+                elif attempts >= self.RETRY_MAX_ATTEMPTS:
+                    update_ = {"status": "abandoned", "attempts": attempts, "error_message": res["error_message"]}
+                    retry_queue.update_one(filter_, {"$set": update_})
+                    summary[annc_id]["abandoned"] += 1
+                else:
+                    update_ = {
+                        "attempts": attempts,
+                        "error_message": res["error_message"],
+                        "next_retry_time": now + self.get_retry_delay(attempts + 1),
+                    }
+                    retry_queue.update_one(filter_, {"$set": update_})
+                    summary[annc_id]["failed"] += 1
+
+            self.logger.info(f"Retry announcement {annc_id}: {summary[annc_id]}")
+
+        return summary
+
+    def save_delivery_records(self, annc_id: str, kind: str, chats: list) -> None:
+        self.delivery_records.delete_many({"annc_id": annc_id, "kind": kind})
+        buckets = [
+            {
+                "annc_id": annc_id,
+                "kind": kind,
+                "bucket": i // self.DELIVERY_BUCKET_SIZE,
+                "count": len(chats[i : i + self.DELIVERY_BUCKET_SIZE]),
+                "chats": chats[i : i + self.DELIVERY_BUCKET_SIZE],
+            }
+            for i in range(0, len(chats), self.DELIVERY_BUCKET_SIZE)
+        ]
+        if buckets:
+            self.delivery_records.insert_many(buckets)
+
+    def load_delivery_records(self, annc_id: str, kind: str) -> list:
+        filter_ = {"annc_id": annc_id, "kind": kind}
+        buckets = self.delivery_records.find(filter_, {"chats": 1}).sort("bucket", pm.ASCENDING)
+        return [chat for bucket in buckets for chat in bucket["chats"]]
+
+    def update_delivery_record(self, annc_id: str, chat: dict) -> bool:
+        """
+        Replace the failed record entry of a chat with the successful one, return False if no failed entry found
+        """
+        filter_ = {
+            "annc_id": annc_id,
+            "kind": "record",
+            "chats": {"$elemMatch": {"id": str(chat["id"]), "message_id": "Failed"}},
+        }
+        return self.delivery_records.update_one(filter_, {"$set": {"chats.$": chat}}).modified_count == 1
+
+    def get_delivery_counts(self, annc_ids: list = None, with_names: bool = False) -> pd.DataFrame:
+        """
+        Aggregate delivery records per announcement and kind
+        return: DataFrame with columns annc_id, kind, number, failed (and names if with_names)
+        """
+        group_ = {
+            "_id": {"annc_id": "$annc_id", "kind": "$kind"},
+            "number": {"$sum": 1},
+            "failed": {"$sum": {"$cond": [{"$eq": ["$chats.message_id", "Failed"]}, 1, 0]}},
+        }
+        if with_names:
+            group_["names"] = {"$push": "$chats.name"}
+
+        pipeline = [{"$match": {"annc_id": {"$in": annc_ids}}}] if annc_ids is not None else []
+        pipeline += [{"$unwind": "$chats"}, {"$group": group_}]
+
+        columns = ["annc_id", "kind", "number", "failed"] + (["names"] if with_names else [])
+        counts = [{**i.pop("_id"), **i} for i in self.delivery_records.aggregate(pipeline)]
+        return pd.DataFrame(counts, columns=columns)
+
+    def get_chat_number(self, annc: any) -> int:
+        if isinstance(annc, Announcement):
+            if annc.available_chats is not None:
+                return len(annc.available_chats)
+            filter_ = {"annc_id": annc.id, "kind": "available_chats"}
+            pipeline = [{"$match": filter_}, {"$group": {"_id": None, "number": {"$sum": "$count"}}}]
+        else:
+            # tickets reach the chats the original announcement was delivered to, Failed ones are skipped by
+            # edit_annc and delete_annc
+            if annc.available_chats is not None:
+                return len([i for i in annc.available_chats if i["message_id"] != "Failed"])
+            filter_ = {"annc_id": annc.original_id, "kind": "record"}
+            pipeline = [
+                {"$match": filter_},
+                {"$unwind": "$chats"},
+                {"$match": {"chats.message_id": {"$ne": "Failed"}}},
+                {"$count": "number"},
+            ]
+        result = list(self.delivery_records.aggregate(pipeline))
+        return result[0]["number"] if result else 0
+
+    def save_record(self, record: Record) -> None:
+        """
+        Upsert an announcement or ticket into AnnouncementDB.Announcement, per-chat lists of an
+        announcement go to AnnouncementDB.DeliveryRecords, tickets never store them
+        """
         annc_records = self.init_collection("AnnouncementDB", "Announcement")
-        annc_records.insert_one(ticket.__dict__)
+        document = record.to_document(exclude=self.DELIVERY_FIELDS)
+        annc_records.update_one({"id": record.id}, {"$set": document}, upsert=True)
 
-    def input_delete_record(self, ticket: DeleteTicket) -> None:
+        if isinstance(record, Announcement):
+            for kind in self.DELIVERY_FIELDS:
+                if getattr(record, kind) is not None:
+                    self.save_delivery_records(record.id, kind, getattr(record, kind))
+
+    def migrate_delivery_records(self) -> int:
+        """
+        Move inline available_chats / record lists of old documents into AnnouncementDB.DeliveryRecords
+        """
         annc_records = self.init_collection("AnnouncementDB", "Announcement")
-        annc_records.insert_one(ticket.__dict__)
+        filter_ = {"$or": [{kind: {"$exists": True}} for kind in self.DELIVERY_FIELDS]}
+
+        number = 0
+        for doc in annc_records.find(filter_, {"id": 1, "operation": 1, **{kind: 1 for kind in self.DELIVERY_FIELDS}}):
+            if doc.get("operation") == "post":
+                for kind in self.DELIVERY_FIELDS:
+                    if isinstance(doc.get(kind), list):
+                        self.save_delivery_records(doc["id"], kind, doc[kind])
+            annc_records.update_one({"_id": doc["_id"]}, {"$unset": {kind: "" for kind in self.DELIVERY_FIELDS}})
+            number += 1
+
+        if number:
+            self.logger.info(f"Migrate delivery records of {number} documents to AnnouncementDB.DeliveryRecords")
+        return number
+
+    def input_annc_record(self, annc: Announcement) -> None:
+        self.save_record(annc)
+
+    def input_edit_record(self, ticket: EditTicket) -> None:
+        self.save_record(ticket)
+
+    def input_delete_record(self, ticket: DeleteTicket) -> None:
+        self.save_record(ticket)
 
-    def get_annc_by_id(self, id: any) -> Announcement:
+    def get_annc_by_id(self, id: any, chats: list = None) -> Announcement:
+        """
+        param chats: delivery lists to load, subset of DELIVERY_FIELDS, default is none of them
+        """
         annc_records = self.init_collection("AnnouncementDB", "Announcement")
         filter_ = {"id": str(id), "operation": "post"}
-        annc = annc_records.find_one(filter_)
+        annc = annc_records.find_one(filter_, Announcement.projection())
 
         if annc:
-            del annc["_id"]
-            return Announcement(**annc)
+            for kind in chats or []:
+                annc[kind] = self.load_delivery_records(annc["id"], kind)
+            return Announcement.from_document(annc)
         else:
             return None
 
     def get_edit_ticket_by_id(self, id: str) -> EditTicket:
         annc_records = self.init_collection("AnnouncementDB", "Announcement")
         filter_ = {"id": id, "operation": "edit"}
-        ticket = annc_records.find_one(filter_)
+        ticket = annc_records.find_one(filter_, EditTicket.projection())
 
         if ticket:
-            del ticket["_id"]
-            return EditTicket(**ticket)
+            return EditTicket.from_document(ticket)
         else:
             return None
 
     def get_delete_ticket_by_id(self, id: str) -> DeleteTicket:
         annc_records = self.init_collection("AnnouncementDB", "Announcement")
         filter_ = {"id": id, "operation": "delete"}
-        ticket = annc_records.find_one(filter_)
+        ticket = annc_records.find_one(filter_, DeleteTicket.projection())
 
         if ticket:
-            del ticket["_id"]
-            return DeleteTicket(**ticket)
+            return DeleteTicket.from_document(ticket)
         else:
             return None
 
@@ -942,16 +1239,14 @@ class Tools:
         filter_ = {"operation": "post", "id": {"$not": {"$regex": "^test"}}}
         annc_records = pd.DataFrame(list(annc_records.find(filter_))).sort_values(by="create_time", ascending=False)
 
-        annc_records["expected_number"] = annc_records["available_chats"].apply(
-            lambda x: len(x) if isinstance(x, list) else 0
-        )
-        annc_records["actual_number"] = annc_records["record"].apply(lambda x: len(x) if isinstance(x, list) else 0)
-        annc_records["expected_chats"] = annc_records["available_chats"].apply(
-            lambda x: ", ".join([i["name"] for i in x] if isinstance(x, list) else [])
-        )
-        annc_records["actual_chats"] = annc_records["record"].apply(
-            lambda x: ", ".join([i["name"] for i in x] if isinstance(x, list) else [])
-        )
+        counts = self.get_delivery_counts(annc_records["id"].tolist(), with_names=True)
+        for kind, number_column, chats_column in [
+            ("available_chats", "expected_number", "expected_chats"),
+            ("record", "actual_number", "actual_chats"),
+        ]:
+            kind_counts = counts[counts["kind"] == kind].set_index("annc_id")
+            annc_records[number_column] = annc_records["id"].map(kind_counts["number"]).fillna(0).astype(int)
+            annc_records[chats_column] = annc_records["id"].map(kind_counts["names"].str.join(", ")).fillna("")
         annc_records["labels"] = annc_records["labels"].apply(lambda x: ", ".join(x) if isinstance(x, list) else "")
         annc_records["language"] = annc_records["language"].apply(
             lambda x: self.get_columns_name(x, "al") if isinstance(x, str) else ""
@@ -970,7 +1265,7 @@ class Tools:
             "content_html",
             "file_path",
         ]
-        annc_records = annc_records.drop(columns=drop_columns)[
+        annc_records = annc_records.drop(columns=drop_columns, errors="ignore")[
             [
                 "id",
                 "status",
@@ -991,11 +1286,9 @@ class Tools:
         ]
         annc_records.columns = [self.get_columns_name(col, "al") for col in annc_records.columns]
 
-        online_sheet = self.init_online_sheet(
-            self.ONLINE_ANNC_RECORDS_URL, self.ONLINE_ANNC_RECORDS_TABLE_NAME, to_type="ws"
+        self.sheets.write_frame(
+            self.ONLINE_ANNC_RECORDS_URL, self.ONLINE_ANNC_RECORDS_TABLE_NAME, annc_records, clear=True
         )
-        online_sheet.clear()
-        online_sheet.set_dataframe(annc_records, (1, 1))
         return
 
     def update_edit_record(self) -> None:
@@ -1011,7 +1304,7 @@ class Tools:
             "original_content_html",
             "new_content_html",
         ]
-        tickets = tickets.drop(columns=drop_columns)[
+        tickets = tickets.drop(columns=drop_columns, errors="ignore")[
             [
                 "id",
                 "status",
@@ -1026,11 +1319,9 @@ class Tools:
         ]
         tickets.columns = [self.get_columns_name(col, "el") for col in tickets.columns]
 
-        online_sheet = self.init_online_sheet(
-            self.ONLINE_ANNC_RECORDS_URL, self.ONLINE_EDIT_TICKET_RECORDS_TABLE_NAME, to_type="ws"
+        self.sheets.write_frame(
+            self.ONLINE_ANNC_RECORDS_URL, self.ONLINE_EDIT_TICKET_RECORDS_TABLE_NAME, tickets, clear=True
         )
-        online_sheet.clear()
-        online_sheet.set_dataframe(tickets, (1, 1))
 
     def update_delete_record(self) -> None:
         annc_records = self.init_collection("AnnouncementDB", "Announcement")
@@ -1048,7 +1339,7 @@ class Tools:
             "original_content_html",
         ]
 
-        tickets = tickets.drop(columns=drop_columns)[
+        tickets = tickets.drop(columns=drop_columns, errors="ignore")[
             [
                 "id",
                 "status",
@@ -1062,11 +1353,9 @@ class Tools:
         ]
         tickets.columns = [self.get_columns_name(col, "dl") for col in tickets.columns]
 
-        online_sheet = self.init_online_sheet(
-            self.ONLINE_ANNC_RECORDS_URL, self.ONLINE_DELETE_TICKET_RECORDS_TABLE_NAME, to_type="ws"
+        self.sheets.write_frame(
+            self.ONLINE_ANNC_RECORDS_URL, self.ONLINE_DELETE_TICKET_RECORDS_TABLE_NAME, tickets, clear=True
         )
-        online_sheet.clear()
-        online_sheet.set_dataframe(tickets, (1, 1))
 
     @staticmethod
     def get_help_message() -> str:
@@ -1094,12 +1383,7 @@ class Tools:
         """
 
     def get_bt_from_df(self, df: pd.DataFrame) -> str:
-        table = BeautifulTable()
-        table.set_style(BeautifulTable.STYLE_BOX)
-        table.columns.header = df.columns.tolist()
-        for _, row in df.iterrows():
-            table.rows.append(row.tolist())
-        return f"<pre>{table}</pre>"
+        return pre_table(df)
 
     def get_permission_table(self) -> str:
         permission = self.init_collection("AnnouncementDB", "Permissions")
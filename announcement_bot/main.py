@@ -255,7 +255,7 @@ class AnnouncementBot:
         id = query.data.split("_")[1]
 
         approver = update.effective_user
-        annc = self.tools.get_annc_by_id(id)
+        annc = self.tools.get_annc_by_id(id, chats=["available_chats"] if operation == "approve" else None)
 
         if self.tools.is_admin(approver.id):
             inputs = {
@@ -269,6 +269,7 @@ class AnnouncementBot:
                 result = await self.tools.post_annc(annc, self.info_bot)
                 parsed_result = self.tools.parse_annc_result(result)
                 inputs["record"] = parsed_result
+                await self.report_quarantine(self.tools.update_chat_health(annc.available_chats, result))
             else:
                 inputs["status"] = "rejected"
 
@@ -280,10 +281,10 @@ class AnnouncementBot:
 
             self.logger.info(f"Announcement {annc.id} was {annc.status} by {approver.full_name}({approver.id})")
 
-            announcement_db = self.tools.init_collection("AnnouncementDB", "Announcement")
-            filter_ = {"id": annc.id}
-            update_ = {"$set": annc.__dict__}
-            announcement_db.update_one(filter_, update_)
+            self.tools.save_record(annc)
+
+            if annc.status == "approved":
+                self.tools.enqueue_failed_chats(annc)
 
             self.tools.update_annc_record()
 
@@ -337,7 +338,6 @@ class AnnouncementBot:
 
         inputs = {
             "original_id": annc.id,
-            "available_chats": annc.record,
             "content_type": annc.content_type,
             "original_content_text": annc.content_text,
             "original_content_html": annc.content_html,
@@ -406,7 +406,9 @@ class AnnouncementBot:
                 "approved_time": dt.now(),
             }
             if status == "edit_approve":
-                await self.tools.edit_annc(ticket, self.info_bot)
+                ticket.update(available_chats=self.tools.load_delivery_records(ticket.original_id, "record"))
+                result = await self.tools.edit_annc(ticket, self.info_bot)
+                await self.report_quarantine(self.tools.update_chat_health(ticket.available_chats, result))
                 inputs["status"] = "approved"
                 ticket.update(**inputs)
             else:
@@ -419,10 +421,7 @@ class AnnouncementBot:
 
             await query.message.edit_text(repost_message, parse_mode="HTML")
 
-            announcement_db = self.tools.init_collection("AnnouncementDB", "Announcement")
-            filter_ = {"id": ticket.id}
-            update_ = {"$set": ticket.__dict__}
-            announcement_db.update_one(filter_, update_)
+            self.tools.save_record(ticket)
             self.tools.update_edit_record()
 
             # only update original annc if approved
@@ -433,9 +432,7 @@ class AnnouncementBot:
                     "content_html": ticket.new_content_html,
                 }
                 annc.update(**inputs)
-                filter_ = {"id": annc.id}
-                update_ = {"$set": annc.__dict__}
-                announcement_db.update_one(filter_, update_)
+                self.tools.save_record(annc)
 
             self.tools.update_annc_record()
 
@@ -492,7 +489,6 @@ class AnnouncementBot:
             "content_type": annc.content_type,
             "original_content_text": annc.content_text,
             "original_content_html": annc.content_html,
-            "available_chats": annc.record,
             "status": "pending",
         }
         delete_ticket.update(**update_)
@@ -561,7 +557,11 @@ class AnnouncementBot:
                 "approved_time": dt.now(),
             }
             if status == "approve":
-                await self.tools.delete_annc(ticket, self.info_bot)
+                # before the delete, so a retry sweep can not post the announcement to its failed chats afterwards
+                self.tools.mark_annc_deleted(ticket.original_id)
+                ticket.update(available_chats=self.tools.load_delivery_records(ticket.original_id, "record"))
+                result = await self.tools.delete_annc(ticket, self.info_bot)
+                await self.report_quarantine(self.tools.update_chat_health(ticket.available_chats, result))
                 inputs["status"] = "approved"
                 ticket.update(**inputs)
             else:
@@ -571,10 +571,7 @@ class AnnouncementBot:
             self.logger.info(f"Delete ticket {ticket.id} was {ticket.status} by {operator.full_name}({operator.id})")
 
             # update ticket in announcement DB
-            annc_db = self.tools.init_collection("AnnouncementDB", "Announcement")
-            filter_ = {"id": ticket.id}
-            update_ = {"$set": ticket.__dict__}
-            annc_db.update_one(filter_, update_, upsert=True)
+            self.tools.save_record(ticket)
             self.tools.update_delete_record()
 
             # edit confirmation message
@@ -710,6 +707,64 @@ class AnnouncementBot:
 
         return ConversationHandler.END
 
+    async def report_quarantine(self, chats: list) -> None:
+        if not chats:
+            return
+
+        await self.bot.send_message(
+            chat_id=self.tools.config[self.CONFIRMATION_GROUP] if not self.is_test else "5327851721",
+            text=self.tools.get_quarantine_message(chats),
+            parse_mode="HTML",
+        )
+
+    async def retry_sweep(self, context: ContextTypes) -> None:
+        summary = await self.tools.retry_failed_annc(self.info_bot)
+        if summary:
+            await self.report_quarantine([chat for i in summary.values() for chat in i["quarantined"]])
+            self.tools.update_annc_record()
+
+    async def retry(self, update: Update, context: ContextTypes) -> None:
+        operator = update.message.from_user
+
+        if not self.tools.is_admin(operator.id):
+            await update.message.reply_text(
+                f"Hi {operator.full_name}, You are not an admin, can't retry announcements."
+            )
+            return
+
+        self.logger.info(f"Retry sweep forced by {operator.full_name}({operator.id})")
+        summary = await self.tools.retry_failed_annc(self.info_bot, force=True)
+        if not summary:
+            await update.message.reply_text("No failed chats waiting for retry.")
+            return
+
+        await self.report_quarantine([chat for i in summary.values() for chat in i["quarantined"]])
+        self.tools.update_annc_record()
+        lines = [
+            f"<code>{annc_id}</code>: {i['success']} success, {i['failed']} failed, {i['abandoned']} abandoned"
+            for annc_id, i in summary.items()
+        ]
+        message = "<b>[Retry Result]</b>\n\n" + "\n".join(lines)
+        await update.message.reply_text(message, parse_mode="HTML")
+
+    async def release_chat(self, update: Update, context: ContextTypes) -> None:
+        operator = update.message.from_user
+
+        if not self.tools.is_admin(operator.id):
+            await update.message.reply_text(f"Hi {operator.full_name}, You are not an admin, can't release chats.")
+            return
+
+        if not context.args:
+            await update.message.reply_text("Please enter the chat id, like: /release_chat -1001234567890")
+            return
+
+        for id in context.args:
+            if self.tools.release_chat(id):
+                self.logger.info(f"Chat {id} released from quarantine by {operator.full_name}({operator.id})")
+                await update.message.reply_text(f"Chat {id} released from quarantine.")
+            else:
+                await update.message.reply_text(f"Chat {id} is not quarantined.")
+
     async def cancel(self, update: Update, context: ContextTypes) -> int:
         operator = update.message.from_user
 
@@ -731,6 +786,7 @@ class AnnouncementBot:
 
     def run(self) -> None:
         self.logger.info("MainBot is running...")
+        self.tools.migrate_delivery_records()
         application = Application.builder().token(self.tools.config[self.BOT_KEY]).build()
 
         application.add_handler(CommandHandler("help", self.help))
@@ -796,6 +852,10 @@ class AnnouncementBot:
             CallbackQueryHandler(self.delete_confirmation, pattern=r"^(delete_approve|delete_reject)_.*")
         )
         application.add_handler(CommandHandler("check_permission", self.check_permission))
+        application.add_handler(CommandHandler("retry", self.retry))
+        application.add_handler(CommandHandler("release_chat", self.release_chat))
+
+        application.job_queue.run_repeating(self.retry_sweep, interval=self.tools.RETRY_BASE_DELAY)
 
         application.run_polling()
 
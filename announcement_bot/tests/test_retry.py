@@ -0,0 +1,58 @@
+import asyncio
+import logging
+from datetime import datetime
+from unittest import mock
+
+import mongomock
+import pytest
+from lib.utils import Announcement, Tools
+
+
+@pytest.fixture
+def tools() -> Tools:
+    tools = Tools.__new__(Tools)
+    tools.mongo_client = mongomock.MongoClient()
+    tools.delivery_records = tools.init_delivery_records()
+    tools.logger = logging.getLogger("test")
+    tools.post_annc = mock.AsyncMock(return_value=[])
+    return tools
+
+
+def post(tools: Tools) -> Announcement:
+    annc = Announcement(
+        id="annc-1",
+        operation="post",
+        create_time=datetime.now(),
+        creator="creator",
+        creator_id="1",
+        available_chats=[{"id": "100", "name": "ok"}, {"id": "200", "name": "failed"}],
+        record=[
+            {"id": "100", "name": "ok", "message_id": 10},
+            {"id": "200", "name": "failed", "message_id": "Failed", "error_message": "timeout"},
+        ],
+        status="approved",
+    )
+    tools.save_record(annc)
+    tools.enqueue_failed_chats(annc)
+    return annc
+
+
+def test_sweep_retries_failed_chats(tools):
+    post(tools)
+
+    asyncio.run(tools.retry_failed_annc(bot=mock.Mock(), force=True))
+
+    tools.post_annc.assert_awaited_once()
+
+
+def test_sweep_after_delete_does_not_repost(tools):
+    annc = post(tools)
+
+    assert tools.mark_annc_deleted(annc.id) == 1
+    summary = asyncio.run(tools.retry_failed_annc(bot=mock.Mock(), force=True))
+
+    assert summary == {}
+    tools.post_annc.assert_not_awaited()
+    assert tools.get_annc_by_id(annc.id).status == "deleted"
+    retry_queue = tools.init_collection("AnnouncementDB", "RetryQueue")
+    assert {i["status"] for i in retry_queue.find({"annc_id": annc.id})} == {"cancelled"}
@@ -0,0 +1,163 @@
+import logging
+import time
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+import pygsheets as pg
+from pygsheets.utils import format_addr, numericise_all
+
+
+class SheetSession:
+    """
+    Google Sheets session shared by the bots.
+    - spreadsheet and worksheet handles are cached per url, so a sheet is opened once per process
+    - reads of several worksheets go out as one values.batchGet, writes as one values.batchClear plus
+      one values.batchUpdateByDataFilter
+    - every request sent to the Sheets API is counted in `quota`, split into read and write requests
+    Requests go through the public value methods of pygsheets' SheetAPIWrapper (`client.sheet`).
+    """
+
+    def __init__(self, client: pg.client.Client, logger: logging.Logger = None):
+        self.client = client
+        self.logger = logger or logging.getLogger("SheetSession")
+        self.quota = {"read": 0, "write": 0}
+
+        self._spreadsheets = {}
+        self._frames = {}
+
+    def _count(self, kind: str, number: int = 1):
+        self.quota[kind] += number
+
+    @staticmethod
+    def _a1(title: str, cell: str = None) -> str:
+        title = "'{}'".format(title.replace("'", "''"))
+        return f"{title}!{cell}" if cell else title
+
+    @classmethod
+    def _block(cls, title: str, cell: str, values: list) -> str:
+        """
+        A1 range of `values` written from `cell`, a data filter range has to hold every value written to it.
+        """
+        row, col = format_addr(cell, output="tuple")
+        end = (row + max(len(values), 1) - 1, col + max([len(i) for i in values], default=1) - 1)
+        return cls._a1(title, f"{cell}:{format_addr(end, output='label')}")
+
+    @staticmethod
+    def _cell(value: any) -> any:
+        if value is None or value is pd.NaT or (isinstance(value, float) and np.isnan(value)):
+            return ""
+        if isinstance(value, np.generic):
+            return value.item()
+        if isinstance(value, (datetime, date, pd.Timestamp)):
+            return str(value)
+        return value
+
+    def frame_values(self, df: pd.DataFrame, header: bool = True) -> list:
+        values = [[self._cell(v) for v in row] for row in df.itertuples(index=False, name=None)]
+        return [[str(i) for i in df.columns]] + values if header else values
+
+    def spreadsheet(self, url: str) -> pg.Spreadsheet:
+        if url not in self._spreadsheets:
+            self._count("read")
+            self._spreadsheets[url] = self.client.open_by_url(url)
+        return self._spreadsheets[url]
+
+    def worksheet_titles(self, url: str) -> list:
+        return [i.title for i in self.spreadsheet(url).worksheets()]
+
+    def worksheet(self, url: str, title: str) -> pg.Worksheet:
+        return self.spreadsheet(url).worksheet_by_title(title)
+
+    def invalidate(self, url: str = None):
+        if url is None:
+            self._spreadsheets.clear()
+            self._frames.clear()
+        else:
+            self._spreadsheets.pop(url, None)
+            self._frames = {k: v for k, v in self._frames.items() if k[0] != url}
+
+    def read_frames(self, url: str, titles: list, max_age: float = 0) -> dict:
+        """
+        Read several worksheets as DataFrames (first row is the header) with one values.batchGet.
+        param max_age: seconds a previous read of the same worksheet can be reused, 0 means always fetch
+        return: {title: DataFrame}, missing worksheets give an empty DataFrame
+        """
+        now = time.monotonic()
+        existing = self.worksheet_titles(url)
+
+        frames = {}
+        to_fetch = []
+        for title in titles:
+            cached = self._frames.get((url, title))
+            if title not in existing:
+                frames[title] = pd.DataFrame()
+            elif cached and now - cached[0] <= max_age:
+                frames[title] = cached[1].copy()
+            else:
+                to_fetch.append(title)
+
+        if to_fetch:
+            self._count("read")
+            value_ranges = self.client.sheet.values_batch_get(self.spreadsheet(url).id, [self._a1(i) for i in to_fetch])
+
+            for title, value_range in zip(to_fetch, value_ranges):
+                values = value_range.get("values", [])
+                if not values:
+                    df = pd.DataFrame()
+                else:
+                    header, rows = values[0], values[1:]
+                    rows = [numericise_all(row + [""] * (len(header) - len(row)))[: len(header)] for row in rows]
+                    df = pd.DataFrame(rows, columns=header)
+                self._frames[(url, title)] = (now, df)
+                frames[title] = df.copy()
+
+        return frames
+
+    def read_frame(self, url: str, title: str, max_age: float = 0) -> pd.DataFrame:
+        return self.read_frames(url, [title], max_age=max_age)[title]
+
+    def write_values(self, url: str, data: list, clear: list = None, parse: bool = True) -> None:
+        """
+        Write several ranges with one values.batchUpdateByDataFilter.
+        param data: [(title, start cell, 2d list of values)]
+        param clear: titles (or A1 ranges) to clear first, sent as one values.batchClear
+        """
+        spreadsheet_id = self.spreadsheet(url).id
+
+        if clear:
+            self._count("write")
+            self.client.sheet.values_batch_clear(spreadsheet_id, [i if "!" in i else self._a1(i) for i in clear])
+
+        if data:
+            self._count("write")
+            self.client.sheet.values_batch_update_by_data_filter(
+                spreadsheet_id,
+                [
+                    {
+                        "dataFilter": {"a1Range": self._block(title, cell, values)},
+                        "majorDimension": "ROWS",
+                        "values": values,
+                    }
+                    for title, cell, values in data
+                ],
+                parse=parse,
+            )
+
+        titles = {i[0] for i in data or []} | {i.split("!")[0].strip("'") for i in clear or []}
+        self._frames = {k: v for k, v in self._frames.items() if k[0] != url or k[1] not in titles}
+
+    def write_frames(self, url: str, frames: dict, clear: bool = False, header: bool = True) -> None:
+        """
+        Write DataFrames to worksheets with one batch request.
+        param frames: {title: (DataFrame, start cell)}
+        param clear: clear the target worksheets first
+        """
+        data = [(title, cell, self.frame_values(df, header)) for title, (df, cell) in frames.items()]
+        self.write_values(url, data, clear=list(frames) if clear else None)
+
+    def write_frame(self, url: str, title: str, df: pd.DataFrame, cell: str = "A1", clear: bool = False) -> None:
+        self.write_frames(url, {title: (df, cell)}, clear=clear)
+
+    def log_quota(self) -> None:
+        self.logger.info(f"Sheets API requests: {self.quota['read']} read, {self.quota['write']} write")
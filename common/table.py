@@ -0,0 +1,169 @@
+import html
+import unicodedata
+from typing import Optional, Union
+
+import pandas as pd
+
+# (horizontal, vertical, corners of the top / header / row / bottom lines as left, mid, right)
+STYLES = {
+    "box": ("─", "│", ("┌", "┬", "┐"), ("├", "┼", "┤"), ("├", "┼", "┤"), ("└", "┴", "┘")),
+    "default": ("-", "|", ("+", "+", "+"), ("+", "+", "+"), ("+", "+", "+"), ("+", "+", "+")),
+}
+PADDING = 1
+
+
+def _cell(value: any, precision: int) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        value = round(value, precision)
+    return str(value)
+
+
+def _width(text: str) -> int:
+    if text.isascii():
+        return len(text)
+    return sum(2 if unicodedata.east_asian_width(i) in "WF" else 1 for i in text)
+
+
+def _wrap(text: str, width: int) -> list:
+    """
+    Split a cell into lines of at most `width` columns, cut at any character like BeautifulTable does.
+    """
+    lines = []
+    for line in text.split("\n"):
+        if _width(line) <= width:
+            lines.append(line)
+            continue
+        part, used = "", 0
+        for char in line:
+            char_width = _width(char)
+            if used + char_width > width and part:
+                lines.append(part)
+                part, used = "", 0
+            part += char
+            used += char_width
+        lines.append(part)
+    return lines
+
+
+def _align(text: str, width: int, align: str) -> str:
+    fill = width - _width(text)
+    if align == "left":
+        return text + " " * fill
+    if align == "right":
+        return " " * fill + text
+    left = fill // 2
+    return " " * left + text + " " * (fill - left)
+
+
+def _fit(content: list, max_width: int) -> list:
+    """
+    Column widths for the widest text of every column, columns above their fair share of `max_width` are shrunk in
+    proportion the way BeautifulTable 1.1 does it (including where it hands out the remaining space), so switching
+    renderer does not move a cell.
+    """
+    count = len(content)
+    offset = count + 1 + 2 * PADDING * count
+    max_width = max(max_width, offset + count)
+    desired = max_width - offset
+
+    within = [i <= int(desired / count) for i in content]
+    kept = sum(width if flag else 1 for width, flag in zip(content, within))
+    avail, actual = desired - kept, sum(content) - kept
+
+    widths = list(content)
+    shrunk = {}
+    for i, width in enumerate(content):
+        if not within[i]:
+            new_width = 1 + int((width - 1) * avail / actual)
+            if new_width < width:
+                widths[i] = new_width
+                shrunk[new_width] = i
+
+    extra = max_width - offset - sum(widths)
+    if shrunk and extra > 0:
+        total = sum(shrunk)
+        for i, width in enumerate(sorted(shrunk)):
+            widths[i] += int(width * extra / total)
+            if i == len(shrunk) - 1:
+                widths[shrunk[width]] += max_width - offset - sum(widths)
+
+    return [i + 2 * PADDING for i in widths]
+
+
+def render_table(
+    data: Union[pd.DataFrame, list],
+    header: Optional[list] = None,
+    align: Union[str, list, dict] = "center",
+    widths: Optional[list] = None,
+    max_width: int = 80,
+    style: str = "box",
+    precision: int = 3,
+) -> str:
+    """
+    Render a DataFrame, or a list of columns, as a fixed-width text table with the layout of BeautifulTable.
+    Cells are formatted a column at a time, floats rounded to `precision` and strings shown as given. Cells wider
+    than their column wrap onto extra lines, a table without rows renders as an empty string.
+    param header: column names, taken from the DataFrame by default
+    param align: left, center or right, for every column or as a list / {column: align}
+    param widths: column widths including padding, fitted to the content and `max_width` when omitted
+    param style: box or default
+    """
+    if isinstance(data, pd.DataFrame):
+        header = [str(i) for i in data.columns] if header is None else header
+        data = [data.iloc[:, i].tolist() for i in range(data.shape[1])]
+    header = [str(i) for i in header]
+
+    columns = [[_cell(value, precision) for value in column] for column in data]
+    if isinstance(align, str):
+        align = [align] * len(header)
+    elif isinstance(align, dict):
+        align = [align.get(i, "center") for i in header]
+
+    if not columns or not columns[0]:
+        return ""
+
+    if widths is None:
+        content = [
+            max(_width(line) for i in [name] + column for line in i.split("\n"))
+            for name, column in zip(header, columns)
+        ]
+        widths = _fit(content, max_width)
+
+    horizontal, vertical, top, header_line, row_line, bottom = STYLES[style]
+    pad = " " * PADDING
+
+    def line(corners: tuple) -> str:
+        left, mid, right = corners
+        return left + mid.join(horizontal * i for i in widths) + right
+
+    def row(cells: list) -> list:
+        wrapped = [_wrap(cell, width - 2 * PADDING) for cell, width in zip(cells, widths)]
+        height = max(len(i) for i in wrapped)
+        return [
+            vertical
+            + vertical.join(
+                pad + _align(lines[i] if i < len(lines) else "", width - 2 * PADDING, how) + pad
+                for lines, width, how in zip(wrapped, widths, align)
+            )
+            + vertical
+            for i in range(height)
+        ]
+
+    separator = line(row_line)
+    body = []
+    for index, cells in enumerate(zip(*columns)):
+        if index:
+            body.append(separator)
+        body += row(list(cells))
+
+    lines = [line(top)] + row(header) + [line(header_line)] + body + [line(bottom)]
+    return "\n".join(lines)
+
+
+def pre_table(data: Union[pd.DataFrame, list], **kwargs) -> str:
+    """
+    render_table wrapped in a <pre> block for Telegram HTML messages, cell text is escaped.
+    """
+    return f"<pre>{html.escape(render_table(data, **kwargs), quote=False)}</pre>"
@@ -26,10 +26,11 @@ class ApyMonitor:
     def __init__(self):
         self.tool = Tools()
         self.gc = self.tool.init_gc_client(self.credential_path)
-        self.dashboard = self.tool.init_wks(self.gc, self.dashboard_url, self.dashboard_name)
+        self.sheets = self.tool.init_sheet_session(self.gc)
+        self.pending_writes = []
 
     def get_dashboard_index(self):
-        sheet = self.dashboard.get_as_df().iloc[:7, :3]
+        sheet = self.sheets.read_frame(self.dashboard_url, self.dashboard_name).iloc[:7, :3]
         sheet.set_index("Currency", inplace=True)
         sheet.columns = sheet.iloc[1]
         sheet = sheet[sheet.index != ""]
@@ -62,13 +63,18 @@ class ApyMonitor:
         aave = results.loc[dashboard.index].loc[results["protocol"] == "aave"][["borrow_rate", "supply_rate"]]
         compound = results.loc[dashboard.index].loc[results["protocol"] == "compound"][["borrow_rate", "supply_rate"]]
 
-        self.tool.update_wks(aave, self.dashboard, "B4", first_clear=False, only_values=True)
-        self.tool.update_wks(compound, self.dashboard, "D4", first_clear=False, only_values=True)
+        self.pending_writes.append(self.tool.frame_data(self.sheets, aave, self.dashboard_name, "B4"))
+        self.pending_writes.append(self.tool.frame_data(self.sheets, compound, self.dashboard_name, "D4"))
         return
 
     async def run(self):
         await self.update_apy_data()
-        self.dashboard.update_value("A9", f"Last updated: {self.tool.get_datetime()} (utc+0)")
+        self.pending_writes.append((self.dashboard_name, "A9", [[f"Last updated: {self.tool.get_datetime()} (utc+0)"]]))
+
+        # all cells of the dashboard go out in one batch update
+        self.sheets.write_values(self.dashboard_url, self.pending_writes)
+        self.pending_writes = []
+        self.sheets.log_quota()
 
 
 async def main():
@@ -3,6 +3,8 @@ from datetime import datetime as dt
 import pandas as pd
 import pygsheets as pg
 
+from common.sheets import SheetSession
+
 
 class Tools:
     @staticmethod
@@ -10,19 +12,15 @@ class Tools:
         return pg.authorize(service_file=credential_path)
 
     @staticmethod
-    def init_wks(gc, sheet_url: str, ws_name: str) -> pg.Worksheet:
-        sh = gc.open_by_url(sheet_url)
-        return sh.worksheet_by_title(ws_name)
+    def init_sheet_session(gc) -> SheetSession:
+        return SheetSession(gc)
 
     @staticmethod
-    def update_wks(df: pd.DataFrame, wks: pg.Worksheet, cell: str, only_values: bool = True, first_clear: bool = False):
-        if first_clear:
-            wks.clear()
-        if only_values:
-            wks.update_values(cell, df.values.tolist())
-        else:
-            wks.set_dataframe(df, cell)
-        return True
+    def frame_data(session: SheetSession, df: pd.DataFrame, ws_name: str, cell: str, only_values: bool = True) -> tuple:
+        """
+        Build one (worksheet, cell, values) entry of SheetSession.write_values
+        """
+        return ws_name, cell, session.frame_values(df, header=not only_values)
 
     @staticmethod
     def get_datetime() -> str:
@@ -31,15 +31,19 @@ class LiquidityMonitor:
     credential_path = os.getenv("GC_CREDENTIAL_PATH")
     dashboard_url = os.getenv("DASHBOARD_URL")
     dashboard_name = "LRT markets liquidity pool data"
+    dashboard_cache_age = 600
 
     def __init__(self):
         self.tool = Tools()
 
         self.gc = self.tool.init_gc_client(self.credential_path)
-        self.dashboard = self.tool.init_wks(self.gc, self.dashboard_url, self.dashboard_name)
+        self.sheets = self.tool.init_sheet_session(self.gc)
+        self.pending_writes = []
 
     def get_dashboard_index(self):
-        sheet = self.dashboard.get_as_df().drop("pair type", axis=1)
+        # the layout of the dashboard does not change between the Balancer and Curve runs
+        sheet = self.sheets.read_frame(self.dashboard_url, self.dashboard_name, max_age=self.dashboard_cache_age)
+        sheet = sheet.drop("pair type", axis=1)
         sheet.set_index("pair", inplace=True)
         sheet.columns = sheet.iloc[0]
         sheet = sheet[sheet.index != ""]
@@ -79,7 +83,7 @@ class LiquidityMonitor:
                 ]
             continue
         dashboard.fillna("-", inplace=True)
-        self.tool.update_wks(dashboard, self.dashboard, "H3", first_clear=False, only_values=True)
+        self.pending_writes.append(self.tool.frame_data(self.sheets, dashboard, self.dashboard_name, "H3"))
         return
 
     async def update_curve_lrt_data(self):
@@ -116,7 +120,7 @@ class LiquidityMonitor:
             continue
 
         dashboard.fillna("-", inplace=True)
-        self.tool.update_wks(dashboard, self.dashboard, "C3", first_clear=False, only_values=True)
+        self.pending_writes.append(self.tool.frame_data(self.sheets, dashboard, self.dashboard_name, "C3"))
         await cur.close()
         return
 
@@ -126,14 +130,21 @@ class LiquidityMonitor:
         elif name == "Balancer":
             await self.update_balancer_v2_lr_data()
 
-        self.dashboard.update_value("A13", f"Updated at {self.tool.get_datetime()}")
+        self.pending_writes.append((self.dashboard_name, "A13", [[f"Updated at {self.tool.get_datetime()}"]]))
         return
 
+    def save(self):
+        # all runs go out in one batch update, so the dashboard read is shared between them
+        self.sheets.write_values(self.dashboard_url, self.pending_writes)
+        self.pending_writes = []
+        self.sheets.log_quota()
+
 
 async def main():
     lm = LiquidityMonitor()
     await lm.run("Balancer")
     await lm.run("Curve")
+    lm.save()
 
 
 if __name__ == "__main__":
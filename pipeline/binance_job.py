@@ -1,11 +1,11 @@
 import asyncio
+import time
 from datetime import datetime as dt
 from datetime import timedelta as td
 
 import pandas as pd
 from cex_services.binance import Binance
-from lib.utils import Tools, query_dict
-from pymongo import UpdateOne
+from lib.utils import BulkWriter, Tools, WatermarkStore, query_dict
 
 from .exchange_job import ExchangeJob
 
@@ -14,10 +14,12 @@ EXCHANGE = "binance"
 
 class TickersJob(ExchangeJob):
     NAME = "tickers"
+    UNIQUE_KEY = ["instrument_id", "timestamp", "exchange"]
 
     def __init__(self):
         self.tools = Tools()
         self.logger = self.tools.get_logger(EXCHANGE)
+        self.writer = BulkWriter(self.tools.init_collection("CexData", "tickers"), self.UNIQUE_KEY, logger=self.logger)
 
     async def parse_tickers(self, tickers: dict, exchange_info: dict) -> list:
         results = []
@@ -34,23 +36,9 @@ class TickersJob(ExchangeJob):
             results.append(ticker)
         return results
 
-    async def save(self, datas: list):
-        collection = self.tools.init_collection("CexData", "tickers")
-        operations = [
-            UpdateOne(
-                {
-                    "instrument_id": data["instrument_id"],
-                    "timestamp": data["timestamp"],
-                    "exchange": data["exchange"],
-                },
-                {
-                    "$set": data,
-                },
-                upsert=True,
-            )
-            for data in datas
-        ]
-        collection.bulk_write(operations)
+    async def save(self, datas: list) -> dict:
+        # tickers are keyed on the time of this run, so every row is new
+        return await self.writer.write(datas, strategy="insert")
 
     async def run(self, **kwargs):
         binance = await Binance().create()
@@ -70,10 +58,21 @@ class TickersJob(ExchangeJob):
 class KlinesJob(ExchangeJob):
     NAME = "klines"
     UNIQUE_KEY = ["instrument_id", "open_time", "exchange"]
+    INTERVAL = "1d"
+    INTERVAL_MS = 24 * 60 * 60 * 1000
+
+    # workers per stage and the bound of the queues between them
+    FETCH_CONCURRENCY = 10
+    PARSE_CONCURRENCY = 2
+    SAVE_CONCURRENCY = 2
+    QUEUE_SIZE = 50
+    SAVE_BATCH = 5000
 
     def __init__(self):
         self.tools = Tools()
         self.logger = self.tools.get_logger(EXCHANGE)
+        self.watermarks = WatermarkStore(self.tools.init_collection("CexData", "watermarks"))
+        self.writer = BulkWriter(self.tools.init_collection("CexData", "klines"), self.UNIQUE_KEY, logger=self.logger)
 
     @staticmethod
     def handle_kwargs(**kwargs):
@@ -90,8 +89,32 @@ class KlinesJob(ExchangeJob):
         return {
             "start": start,
             "end": end,
+            "backfill": bool(kwargs["start"]),
         }
 
+    def get_starts(self, ids: list, **kwargs) -> dict:
+        """
+        Start time of every instrument: the candle after its watermark, or the default start for an instrument without
+        one. An explicit --start backfills every instrument from it.
+        """
+        if kwargs["backfill"]:
+            return {id: kwargs["start"] for id in ids}
+
+        marks = self.watermarks.get(EXCHANGE, self.INTERVAL)
+        return {id: marks[id] + self.INTERVAL_MS if id in marks else kwargs["start"] for id in ids}
+
+    def get_marks(self, datas: list) -> dict:
+        """
+        Latest closed candle of every instrument in `datas`, a candle still open is fetched again by the next run.
+        """
+        now = self.tools.get_timestap()
+        marks = {}
+        for data in datas:
+            open_time = int(data["open_time"])
+            if open_time + self.INTERVAL_MS <= now:
+                marks[data["instrument_id"]] = max(open_time, marks.get(data["instrument_id"], open_time))
+        return marks
+
     async def parse_klines(self, id: str, klines: dict, info: dict) -> list:
 
         results = pd.DataFrame(klines).T
@@ -106,71 +129,107 @@ class KlinesJob(ExchangeJob):
             results["quote_volume"] *= info["contract_size"]
         return results.to_dict(orient="records")
 
-    async def save(self, datas: list):
-        if not datas:
-            return
-
-        collection = self.tools.init_collection("CexData", "klines")
-        operations = [
-            UpdateOne(
-                {
-                    "instrument_id": data["instrument_id"],
-                    "open_time": data["open_time"],
-                    "exchange": data["exchange"],
-                },
-                {
-                    "$set": data,
-                },
-                upsert=True,
-            )
-            for data in datas
-        ]
-        collection.bulk_write(operations)
+    async def save(self, datas: list) -> dict:
+        # mostly new candles, a candle stored while still open is updated
+        return await self.writer.write(datas, strategy="auto")
+
+    async def fetch_stage(
+        self, binance: Binance, ids: asyncio.Queue, parse_queue: asyncio.Queue, stats: dict, **kwargs
+    ):
+        while not ids.empty():
+            id, start = ids.get_nowait()
+            try:
+                klines = await binance.get_klines(id, self.INTERVAL, start, kwargs["end"])
+            except Exception as e:
+                stats["failed"] += 1
+                self.logger.error(f"Failed to fetch klines of {id}: {e}")
+                continue
 
-    def create_batch(self, batch_num: int, ids: list):
-        batches = []
-        for i in range(0, len(ids), batch_num):
-            batches.append(ids[i : i + batch_num])
-        return batches
+            stats["fetched"] += 1
+            for kline_id, kline in klines.items():
+                if kline:
+                    await parse_queue.put((kline_id, kline))
+
+            if stats["fetched"] % 100 == 0:
+                self.logger.info(f"Fetched klines of {stats['fetched']} instruments, {stats['saved']} rows saved")
+
+    async def parse_stage(self, binance: Binance, parse_queue: asyncio.Queue, save_queue: asyncio.Queue, stats: dict):
+        while (item := await parse_queue.get()) is not None:
+            id, kline = item
+            try:
+                rows = await self.parse_klines(id, kline, binance.exchange_info[id])
+            except Exception as e:
+                stats["failed"] += 1
+                self.logger.error(f"Failed to parse klines of {id}: {e}")
+                continue
+            await save_queue.put(rows)
+
+    async def save_stage(self, save_queue: asyncio.Queue, stats: dict):
+        batch = []
+        while True:
+            rows = await save_queue.get()
+            if rows is not None:
+                batch += rows
+            if batch and (rows is None or len(batch) >= self.SAVE_BATCH):
+                try:
+                    result = await self.save(batch)
+                    stats["saved"] += len(batch) - result["failed"]
+                    stats["failed_rows"] += result["failed"]
+                    # a batch with failed rows keeps its watermarks, the next run fetches it again
+                    if not result["failed"]:
+                        await asyncio.to_thread(self.watermarks.update, EXCHANGE, self.INTERVAL, self.get_marks(batch))
+                except Exception as e:
+                    stats["failed_rows"] += len(batch)
+                    self.logger.error(f"Failed to save {len(batch)} klines: {e}")
+                batch = []
+            if rows is None:
+                return
 
     async def run(self, **kwargs):
+        """
+        Fetch, parse and save run as separate stages joined by bounded queues, so requests keep going out while
+        earlier instruments are parsed and written, and a slow stage holds back the one before it.
+        Without --start only the candles after each instrument's watermark are fetched.
+        """
         kwargs = self.handle_kwargs(**kwargs)
+        start = time.monotonic()
 
         binance = await Binance().create()
         info = query_dict(binance.exchange_info, "active == True")
+        starts = {id: start for id, start in self.get_starts(list(info), **kwargs).items() if start <= kwargs["end"]}
+        self.logger.info(f"Total instruments: {len(info)}, up to date: {len(info) - len(starts)}")
+
+        ids = asyncio.Queue()
+        for item in starts.items():
+            ids.put_nowait(item)
+        parse_queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        save_queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        stats = {"fetched": 0, "saved": 0, "failed": 0, "failed_rows": 0}
+
+        fetchers = [
+            asyncio.create_task(self.fetch_stage(binance, ids, parse_queue, stats, **kwargs))
+            for _ in range(self.FETCH_CONCURRENCY)
+        ]
+        parsers = [
+            asyncio.create_task(self.parse_stage(binance, parse_queue, save_queue, stats))
+            for _ in range(self.PARSE_CONCURRENCY)
+        ]
+        savers = [asyncio.create_task(self.save_stage(save_queue, stats)) for _ in range(self.SAVE_CONCURRENCY)]
 
-        # get klines
-        batch_size = 10
-        batches = self.create_batch(batch_size, list(info.keys()))
-        self.logger.info(
-            f"Total batches: {len(batches)}, total instruments: {len([item for sublist in batches for item in sublist])}"
-        )
-        for index, batch in enumerate(batches):
-            print(index)
-            tasks = []
-            for id in batch:
-                task = asyncio.create_task(binance.get_klines(id, "1d", kwargs["start"], kwargs["end"]))
-                tasks.append(task)
-            klines = await asyncio.gather(*tasks)
-
-            # parse klines
-            tasks = []
-            for kline in klines:
-                id = list(kline.keys())[0]
-                task = asyncio.create_task(self.parse_klines(id, kline[id], binance.exchange_info[id]))
-                tasks.append(task)
-            results = await asyncio.gather(*tasks)
-
-            # save klines
-            tasks = []
-            for result in results:
-                task = asyncio.create_task(self.save(result))
-                tasks.append(task)
-            await asyncio.gather(*tasks)
+        # each stage is closed with one sentinel per worker once the stage before it is done
+        await asyncio.gather(*fetchers)
+        for _ in parsers:
+            await parse_queue.put(None)
+        await asyncio.gather(*parsers)
+        for _ in savers:
+            await save_queue.put(None)
+        await asyncio.gather(*savers)
 
         await binance.close()
         self.logger.info(
-            f"Updates klines of Binance. Total batches: {len(batches)}, total instruments: {len([item for sublist in batches for item in sublist])}"
+            f"Updates klines of Binance. Total instruments: {len(info)}, fetched: {stats['fetched']}, "
+            f"rows saved: {stats['saved']}, failed: {stats['failed']} instruments / {stats['failed_rows']} rows, "
+            f"in {time.monotonic() - start:.1f}s"
         )
 
 
@@ -183,6 +242,7 @@ class DcpJob(ExchangeJob):
     def __init__(self):
         self.tools = Tools()
         self.logger = self.tools.get_logger(EXCHANGE)
+        self.writer = BulkWriter(self.tools.init_collection("CexData", "dcp"), self.UNIQUE_KEY, logger=self.logger)
 
     def handle_kwargs(self, **kwargs):
         if kwargs["start"]:
@@ -214,27 +274,9 @@ class DcpJob(ExchangeJob):
             "close": float(average_close),
         }
 
-    async def save(self, datas: list):
-        if not datas:
-            return
-
-        collection = self.tools.init_collection("CexData", "dcp")
-        operations = [
-            UpdateOne(
-                {
-                    "timestamp": data["timestamp"],
-                    "currency": data["currency"],
-                    "exchange": data["exchange"],
-                },
-                {
-                    "$set": data,
-                },
-                upsert=True,
-            )
-            for data in datas
-            if data
-        ]
-        collection.bulk_write(operations)
+    async def save(self, datas: list) -> dict:
+        # closes are recomputed over the whole range, stored ones are updated
+        return await self.writer.write([data for data in datas if data], strategy="auto")
 
     async def run(self, **kwargs):
         kwargs = self.handle_kwargs(**kwargs)
@@ -1,6 +1,5 @@
 from cex_services.bybit import Bybit
-from lib.utils import Tools
-from pymongo import UpdateOne
+from lib.utils import BulkWriter, Tools
 
 from .exchange_job import ExchangeJob
 
@@ -9,10 +8,12 @@ EXCHANGE = "bybit"
 
 class TickersJob(ExchangeJob):
     NAME = "tickers"
+    UNIQUE_KEY = ["instrument_id", "timestamp", "exchange"]
 
     def __init__(self):
         self.tools = Tools()
         self.logger = self.tools.get_logger(EXCHANGE)
+        self.writer = BulkWriter(self.tools.init_collection("CexData", "tickers"), self.UNIQUE_KEY, logger=self.logger)
 
     async def parse_tickers(self, tickers: dict) -> list:
         results = []
@@ -29,23 +30,9 @@ class TickersJob(ExchangeJob):
             results.append(ticker)
         return results
 
-    async def save(self, datas: list):
-        collection = self.tools.init_collection("CexData", "tickers")
-        operations = [
-            UpdateOne(
-                {
-                    "instrument_id": data["instrument_id"],
-                    "timestamp": data["timestamp"],
-                    "exchange": data["exchange"],
-                },
-                {
-                    "$set": data,
-                },
-                upsert=True,
-            )
-            for data in datas
-        ]
-        collection.bulk_write(operations)
+    async def save(self, datas: list) -> dict:
+        # tickers are keyed on the time of this run, so every row is new
+        return await self.writer.write(datas, strategy="insert")
 
     async def run(self, **kwargs):
         okx = await Bybit().create()
@@ -1,6 +1,8 @@
+import asyncio
 import json
 import logging
 import os
+import time
 from datetime import datetime as dt
 
 import pandas as pd
@@ -122,3 +124,155 @@ class Tools(object):
     @staticmethod
     def parse_timestamp_to_str(timestamp: int, to_format: str = "%Y%m%d") -> str:
         return dt.fromtimestamp(timestamp / 1000).strftime(to_format)
+
+
+class WatermarkStore:
+    """
+    Last stored open_time of every (exchange, instrument_id, interval), so incremental jobs fetch only the gap after it.
+    Marks only move forward and are written after the rows they cover, a failed run resumes from the last saved rows.
+    """
+
+    KEY = ["exchange", "instrument_id", "interval"]
+
+    def __init__(self, collection: pm.collection.Collection):
+        self.collection = collection
+        self.collection.create_index([(i, pm.ASCENDING) for i in self.KEY], unique=True)
+
+    def get(self, exchange: str, interval: str) -> dict:
+        """
+        :return: {instrument_id: open_time}
+        """
+        cursor = self.collection.find(
+            {"exchange": exchange, "interval": interval}, {"_id": 0, "instrument_id": 1, "open_time": 1}
+        )
+        return {i["instrument_id"]: i["open_time"] for i in cursor}
+
+    def update(self, exchange: str, interval: str, marks: dict) -> None:
+        """
+        :param marks: {instrument_id: open_time}, a mark older than the stored one is ignored
+        """
+        if not marks:
+            return
+
+        updated_time = int(dt.now().timestamp() * 1000)
+        operations = [
+            pm.UpdateOne(
+                {"exchange": exchange, "instrument_id": id, "interval": interval},
+                {"$max": {"open_time": int(open_time)}, "$set": {"updated_time": updated_time}},
+                upsert=True,
+            )
+            for id, open_time in marks.items()
+        ]
+        self.collection.bulk_write(operations, ordered=False)
+
+
+class BulkWriter:
+    """
+    Bulk saves of rows keyed on `unique_key`, which gets a unique index.
+    - insert: insert_many(ordered=False), rows whose key is already stored are skipped
+    - upsert: one UpdateOne($set, upsert=True) per row, sent unordered
+    - auto: insert first, then upsert only the rows rejected as duplicates
+    Rows are written in chunks of `chunk_size`, up to `concurrency` chunks at a time from worker threads. A bad row
+    fails alone instead of aborting its batch, and every write logs its counts and latency.
+    """
+
+    STRATEGIES = ["insert", "upsert", "auto"]
+    DUPLICATE_KEY = 11000
+
+    def __init__(
+        self,
+        collection: pm.collection.Collection,
+        unique_key: list,
+        chunk_size: int = 1000,
+        concurrency: int = 4,
+        logger: logging.Logger = None,
+    ):
+        self.collection = collection
+        self.unique_key = unique_key
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.logger = logger or logging.getLogger("BulkWriter")
+        self.unique = self.init_index()
+
+    def init_index(self) -> bool:
+        try:
+            self.collection.create_index([(i, pm.ASCENDING) for i in self.unique_key], unique=True)
+            return True
+        except pm.errors.OperationFailure as e:
+            # existing duplicates, inserts would add more of them so every write falls back to upserts
+            self.logger.warning(f"No unique index on {self.collection.name} {self.unique_key}, writes upsert: {e}")
+            return False
+
+    def _upsert(self, rows: list) -> dict:
+        operations = [
+            pm.UpdateOne(
+                {key: row[key] for key in self.unique_key},
+                {"$set": {k: v for k, v in row.items() if k != "_id"}},
+                upsert=True,
+            )
+            for row in rows
+        ]
+        try:
+            result = self.collection.bulk_write(operations, ordered=False).bulk_api_result
+            failed = 0
+        except pm.errors.BulkWriteError as e:
+            result = e.details
+            failed = len(result["writeErrors"])
+            self.logger.error(f"{self.collection.name}: {failed} upserts failed, first: {result['writeErrors'][0]}")
+        return {"inserted": result["nUpserted"], "updated": result["nMatched"], "skipped": 0, "failed": failed}
+
+    def _insert(self, rows: list, update: bool) -> dict:
+        rows = [dict(i) for i in rows]
+        try:
+            self.collection.insert_many(rows, ordered=False)
+            return {"inserted": len(rows), "updated": 0, "skipped": 0, "failed": 0}
+        except pm.errors.BulkWriteError as e:
+            errors = e.details["writeErrors"]
+
+        duplicates = [rows[i["index"]] for i in errors if i["code"] == self.DUPLICATE_KEY]
+        failed = len(errors) - len(duplicates)
+        if failed:
+            self.logger.error(f"{self.collection.name}: {failed} inserts failed, first: {errors[0]}")
+
+        counts = {"inserted": len(rows) - len(errors), "updated": 0, "skipped": len(duplicates), "failed": failed}
+        if update and duplicates:
+            upserted = self._upsert(duplicates)
+            counts["inserted"] += upserted["inserted"]
+            counts["updated"] = upserted["updated"]
+            counts["failed"] += upserted["failed"]
+            counts["skipped"] = 0
+        return counts
+
+    def _write_chunk(self, rows: list, strategy: str) -> dict:
+        if strategy == "upsert" or not self.unique:
+            return self._upsert(rows)
+        return self._insert(rows, update=strategy == "auto")
+
+    async def write(self, rows: list, strategy: str = "auto") -> dict:
+        """
+        :return: counts of inserted, updated, skipped (duplicates left as stored) and failed rows, and the latency
+        """
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown write strategy {strategy}, use one of {self.STRATEGIES}")
+
+        if not rows:
+            return {"inserted": 0, "updated": 0, "skipped": 0, "failed": 0, "seconds": 0}
+
+        start = time.monotonic()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def write_chunk(chunk: list) -> dict:
+            async with semaphore:
+                return await asyncio.to_thread(self._write_chunk, chunk, strategy)
+
+        chunks = [rows[i : i + self.chunk_size] for i in range(0, len(rows), self.chunk_size)]
+        results = await asyncio.gather(*[write_chunk(i) for i in chunks])
+
+        counts = {key: sum(i[key] for i in results) for key in ["inserted", "updated", "skipped", "failed"]}
+        counts["seconds"] = round(time.monotonic() - start, 3)
+        self.logger.info(
+            f"{self.collection.name} {strategy}: {len(rows)} rows in {len(chunks)} chunks, {counts['inserted']} inserted, "
+            f"{counts['updated']} updated, {counts['skipped']} skipped, {counts['failed']} failed, "
+            f"{counts['seconds'] * 1000:.0f} ms"
+        )
+        return counts
@@ -0,0 +1,93 @@
+"""
+Writes the synthetic fixture set bundled in benchmark/fixtures, enough to run every job of the harness offline:
+    PYTHONPATH=.. python -m benchmark.fixtures --volume_num 10
+
+Token i has 37 * i market pairs on every category, the listing pages hold two thirds of the tokens per exchange.
+Record real responses with `python -m benchmark.harness --record` for representative numbers.
+"""
+
+import argparse
+import json
+from urllib.parse import urlparse
+
+from benchmark.harness import FIXTURE_PATH
+from benchmark.replay import FixtureStore
+from lib.utils import AsyncGrabber, Grabber
+
+# exchanges probed by Grabber.get_listing_info, {name: CMC slug}
+EXCHANGES = {
+    "binance": "binance",
+    "houbi": "huobi-global",
+    "okx": "okx",
+    "gate.io": "gate-io",
+    "kraken": "kraken",
+    "coinbase": "coinbase-exchange",
+    "crypto.com": "crypto-com-exchange",
+    "kucoin": "kucoin",
+    "bitfinex": "bitfinex",
+    "bybit": "bybit",
+}
+
+
+def init_args() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Write synthetic fixtures for the benchmark harness")
+    parser.add_argument("--fixtures", type=str, help="Fixture folder", default=FIXTURE_PATH)
+    parser.add_argument("--volume_num", type=int, help="Tokens in the fixtures", default=10)
+    return parser
+
+
+def save(store: FixtureStore, url: str, body: dict, query: str = None) -> None:
+    url = urlparse(url)
+    store.save(store.key(url.netloc + url.path, url.query if query is None else query), 200, json.dumps(body))
+
+
+def write_fixtures(store: FixtureStore, num: int) -> None:
+    symbols = [f"T{i}" for i in range(1, num + 1)]
+
+    key_info = {
+        "data": {
+            "plan": {"rate_limit_minute": 30},
+            "usage": {"current_day": {"credits_left": None}, "current_month": {"credits_left": 900}},
+        },
+        "status": {"credit_count": 0},
+    }
+    save(store, AsyncGrabber.KEY_INFO_URL, key_info)
+
+    token_info = [{"id": i, "name": s, "slug": s.lower(), "symbol": s, "cmc_rank": i} for i, s in enumerate(symbols, 1)]
+    save(
+        store,
+        Grabber.TOKEN_INFO_URL,
+        {"status": {"credit_count": 1}, "data": token_info},
+        query=f"start=1&limit={num}&convert=USD",
+    )
+
+    for i, symbol in enumerate(symbols, 1):
+        pair_num = 37 * i
+        for cat in ["spot", "perpetual"]:
+            for start in range(1, pair_num + 1, 1000):
+                pairs = [
+                    {"exchangeName": f"ex{j % 9}", "volumeUsd": float(j)}
+                    for j in range(start - 1, min(pair_num, start + 999))
+                ]
+                url = Grabber._create_volume_url(slug=symbol.lower(), start=start, limit=1000, cat=cat)
+                save(store, url, {"data": {"numMarketPairs": pair_num, "marketPairs": pairs}})
+
+    for k, slug in enumerate(EXCHANGES.values()):
+        listed = [s for i, s in enumerate(symbols, 1) if (i + k) % 3]
+        for cat in ["spot", "perpetual"]:
+            pairs = [{"baseSymbol": s} for s in listed]
+            probe = {"data": {"numMarketPairs": len(listed), "marketPairs": pairs[:1]}}
+            save(store, Grabber._create_listing_url(slug=slug, cat=cat), probe)
+            page = {"data": {"numMarketPairs": len(listed), "marketPairs": pairs}}
+            save(store, Grabber._create_listing_url(slug=slug, cat=cat, start=1, limit=1000), page)
+
+    woo = [{"symbol": f"SPOT_{s}_USDT"} for s in symbols[: num // 2]]
+    woo += [{"symbol": f"PERP_{s}_USDT"} for s in symbols[num // 4 :]]
+    save(store, Grabber.WOO_LISTING_URL, {"rows": woo})
+
+
+if __name__ == "__main__":
+    args = init_args().parse_args()
+    store = FixtureStore(args.fixtures)
+    write_fixtures(store, args.volume_num)
+    print(f"fixtures: {len(store)}")
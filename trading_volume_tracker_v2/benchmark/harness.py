@@ -0,0 +1,242 @@
+"""
+Offline benchmark of ListingJob, VolumeJob, AnomalyJob and ReportJob.
+
+Record the CMC and WOO responses once (network and a CMC key needed):
+    PYTHONPATH=.. python -m benchmark.harness --record --volume_num 200
+Replay them as often as needed, without network access:
+    PYTHONPATH=.. python -m benchmark.harness --volume_num 200
+
+Jobs run end to end against the replay server and mongomock (or --mongo_url), telegram messages are counted
+instead of sent. The report lists wall time, requests and the time spent in every stage of each job. mongomock does
+not run update pipelines or $merge, so the weekly rollup stages are reported as skipped unless --mongo_url is given.
+
+benchmark/fixtures holds a small synthetic set (10 tokens) written by `python -m benchmark.fixtures`, enough to run
+every job offline; record real responses into another folder with --fixtures for representative numbers.
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime as dt
+from unittest import mock
+
+import pymongo as pm
+from benchmark.replay import FixtureStore, ReplayServer
+from lib.utils import AsyncGrabber, BaseClient, Formatter, Grabber, Tools
+from lib.volume_store import VolumeStore
+
+from pipeline import jobs
+
+FIXTURE_PATH = os.path.join(os.path.abspath(os.path.dirname(__file__)), "fixtures")
+
+# (owner, method name, stage name), each call of the method is timed under its stage
+STAGES = [
+    (Grabber, "get_listing_info", "listing.crawl"),
+    (Grabber, "get_woo_listing", "listing.woo"),
+    (Tools, "update_listing", "listing.save"),
+    (AsyncGrabber, "crawl", "volume.crawl"),
+    (Tools, "save_volume_records", "volume.save"),
+    (Tools, "get_daily_volume", "volume.reload"),
+    (AsyncGrabber, "add_volume_stats", "volume.stats"),
+    (Tools, "update_weekly_volume", "volume.rollup"),
+    (Tools, "rebuild_weekly_volume", "report.rollup"),
+    (VolumeStore, "write_partition", "volume.store"),
+    (Tools, "get_volume_anomalies", "anomaly.detect"),
+    (Tools, "get_unlisted_token_with_top_volume", "report.top"),
+    (Tools, "get_new_tokens_in_top_volume", "report.new"),
+    (Formatter, "create_bt_from_df", "report.table"),
+]
+
+# stages built on update pipelines and $merge, which mongomock does not run, skipped without --mongo_url
+MONGO_STAGES = {"volume.rollup": 0, "report.rollup": None}
+
+
+class StageTimer:
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.skipped = defaultdict(int)
+
+    def skip(self, stage: str, result: any):
+        def skipped(*args, **kwargs):
+            self.skipped[stage] += 1
+            return result
+
+        return skipped
+
+    def wrap(self, func, stage: str):
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    self.seconds[stage] += time.perf_counter() - start
+                    self.calls[stage] += 1
+
+        else:
+
+            @functools.wraps(func)
+            def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.seconds[stage] += time.perf_counter() - start
+                    self.calls[stage] += 1
+
+        return timed
+
+    def patches(self, skip: dict) -> list:
+        """
+        param skip: {stage: return value} of the stages replaced by a no-op that is only counted
+        """
+        patches = []
+        for owner, name, stage in STAGES:
+            func = owner.__dict__[name]
+            if stage in skip:
+                patches.append(mock.patch.object(owner, name, self.skip(stage, skip[stage])))
+            elif isinstance(func, staticmethod):
+                patches.append(mock.patch.object(owner, name, staticmethod(self.wrap(func.__func__, stage))))
+            else:
+                patches.append(mock.patch.object(owner, name, self.wrap(func, stage)))
+        return patches
+
+
+def init_args() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark the trading volume jobs offline")
+    parser.add_argument("--record", action="store_true", help="Record missing fixtures from the live APIs")
+    parser.add_argument("--fixtures", type=str, help="Fixture folder", default=FIXTURE_PATH)
+    parser.add_argument("--volume_num", type=int, help="Tokens to crawl, the bundled fixtures hold 10", default=10)
+    parser.add_argument("--report_cat", type=str, help="total, spot, perpetual or all", default="total")
+    parser.add_argument("--report_num", type=int, help="", default=10)
+    parser.add_argument("--mongo_url", type=str, help="Mongo to run against, mongomock when omitted")
+    parser.add_argument("--jobs", type=str, help="Comma separated jobs to run", default="listing,volume,anomaly,report")
+    parser.add_argument("--json", type=str, help="Also write the results to this file")
+    return parser
+
+
+def init_config(record: bool, mongo_url: str) -> dict:
+    config = {"BOT_KEY": "", "DAVID_CHAT_ID": "", "REPORT_CHAT_ID": "", "CMC_API_KEY": "", "MONGO_URL": mongo_url}
+    if record:
+        if os.path.exists(BaseClient.CONFIG_PATH):
+            config["CMC_API_KEY"] = BaseClient()._init_config()[Grabber.CMC_API_KEY]
+        config["CMC_API_KEY"] = os.environ.get("CMC_API_KEY", config["CMC_API_KEY"])
+    return config
+
+
+def init_mongo_client(mongo_url: str):
+    if mongo_url:
+        return pm.MongoClient(mongo_url)
+    try:
+        import mongomock
+    except ImportError:
+        raise SystemExit("mongomock is not installed, install it or pass --mongo_url")
+    return mongomock.MongoClient()
+
+
+def redirect_patches(server: ReplayServer) -> list:
+    def redirected(func):
+        return staticmethod(lambda *args, **kwargs: server.url(func(*args, **kwargs)))
+
+    return [
+        mock.patch.object(Grabber, "TOKEN_INFO_URL", server.url(Grabber.TOKEN_INFO_URL)),
+        mock.patch.object(Grabber, "WOO_LISTING_URL", server.url(Grabber.WOO_LISTING_URL)),
+        mock.patch.object(AsyncGrabber, "KEY_INFO_URL", server.url(AsyncGrabber.KEY_INFO_URL)),
+        mock.patch.object(Grabber, "_create_volume_url", redirected(Grabber._create_volume_url)),
+        mock.patch.object(Grabber, "_create_listing_url", redirected(Grabber._create_listing_url)),
+    ]
+
+
+def run(args: argparse.Namespace) -> dict:
+    config = init_config(args.record, args.mongo_url)
+    mongo_client = init_mongo_client(args.mongo_url)
+    server = ReplayServer(FixtureStore(args.fixtures), record=args.record).start()
+    timer = StageTimer()
+    messages = []
+
+    patches = redirect_patches(server) + timer.patches(skip={} if args.mongo_url else MONGO_STAGES)
+    patches += [
+        mock.patch.object(BaseClient, "_init_config", lambda self: config),
+        mock.patch.object(Tools, "init_mongo_client", lambda self: mongo_client),
+        mock.patch.object(Tools, "VOLUME_STORE_PATH", tempfile.mkdtemp(prefix="volume_store_")),
+        mock.patch.object(jobs, "send_message", lambda token, message, chat_id: messages.append(message)),
+    ]
+
+    runs = {
+        "listing": lambda: jobs.ListingJob(config).run(),
+        "volume": lambda: jobs.VolumeJob(config).run(args.volume_num),
+        "anomaly": lambda: jobs.AnomalyJob(config).run(test=True),
+        "report": lambda: jobs.ReportJob(config).run(
+            date=dt.today().strftime("%Y%m%d"), cat=args.report_cat, num=args.report_num, test=True
+        ),
+    }
+
+    results = {"record": args.record, "volume_num": args.volume_num, "jobs": {}}
+    for patch in patches:
+        patch.start()
+    try:
+        for name in args.jobs.split(","):
+            served, missing = server.stats["served"], server.stats["missing"]
+            stages = {stage: (timer.seconds[stage], timer.calls[stage]) for stage in timer.seconds}
+            skipped = dict(timer.skipped)
+
+            start = time.perf_counter()
+            runs[name]()
+            wall = time.perf_counter() - start
+
+            results["jobs"][name] = {
+                "wall": round(wall, 3),
+                "requests": server.stats["served"] - served,
+                "missing": server.stats["missing"] - missing,
+                "stages": {
+                    stage: {
+                        "seconds": round(seconds - stages.get(stage, (0, 0))[0], 3),
+                        "calls": timer.calls[stage] - stages.get(stage, (0, 0))[1],
+                    }
+                    for stage, seconds in timer.seconds.items()
+                    if timer.calls[stage] > stages.get(stage, (0, 0))[1]
+                },
+                "skipped": [stage for stage, calls in timer.skipped.items() if calls > skipped.get(stage, 0)],
+            }
+    finally:
+        for patch in reversed(patches):
+            patch.stop()
+        server.stop()
+
+    results["recorded"] = server.stats["recorded"]
+    results["messages"] = len(messages)
+    return results
+
+
+def print_results(results: dict) -> None:
+    print(f"{'job / stage':<24}{'seconds':>10}{'calls':>8}{'requests':>10}")
+    for name, job in results["jobs"].items():
+        print(f"{name:<24}{job['wall']:>10.3f}{'':>8}{job['requests']:>10}")
+        for stage, value in job["stages"].items():
+            print(f"  {stage:<22}{value['seconds']:>10.3f}{value['calls']:>8}")
+        for stage in job["skipped"]:
+            print(f"  {stage:<22}{'skipped, needs --mongo_url':>28}")
+        if job["missing"]:
+            print(f"  {job['missing']} requests had no fixture, run with --record first")
+    print(f"recorded fixtures: {results['recorded']}, telegram messages: {results['messages']}")
+
+
+if __name__ == "__main__":
+    BaseClient._init_logger()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    args = init_args().parse_args()
+    results = run(args)
+    print_results(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,121 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode
+
+import aiohttp
+from aiohttp import web
+
+
+class FixtureStore:
+    """
+    Recorded HTTP responses, one json file per request named by the hash of its host, path and sorted query.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def key(path: str, query: str) -> str:
+        return f"{path}?{urlencode(sorted(parse_qsl(query, keep_blank_values=True)))}"
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, hashlib.sha1(key.encode()).hexdigest() + ".json")
+
+    def load(self, key: str) -> Optional[dict]:
+        try:
+            with open(self._file(key), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, key: str, status: int, body: str) -> None:
+        with open(self._file(key), "w") as f:
+            json.dump({"key": key, "status": status, "body": body}, f)
+
+    def __len__(self) -> int:
+        return len([i for i in os.listdir(self.path) if i.endswith(".json")])
+
+
+class ReplayServer:
+    """
+    Local HTTP server answering http://127.0.0.1:<port>/<host>/<path> from a FixtureStore.
+    - replay mode: a request without a fixture gets a 404, counted in `stats["missing"]`
+    - record mode: a request without a fixture is forwarded to https://<host>/<path> and saved first, 429 / 5xx
+      responses are passed through without being saved
+    The server runs its own event loop in a daemon thread, so the jobs can keep calling asyncio.run.
+    """
+
+    FORWARD_HEADERS = ["Accepts", "X-CMC_PRO_API_KEY"]
+
+    def __init__(self, fixtures: FixtureStore, record: bool = False, port: int = 0):
+        self.fixtures = fixtures
+        self.record = record
+        self.port = port
+        self.stats = {"served": 0, "recorded": 0, "missing": 0}
+
+        self._loop = None
+        self._runner = None
+        self._session = None
+        self._ready = threading.Event()
+
+    def url(self, url: str) -> str:
+        return url.replace("https://", f"http://127.0.0.1:{self.port}/", 1)
+
+    async def _forward(self, request: web.Request, key: str) -> dict:
+        headers = {i: request.headers[i] for i in self.FORWARD_HEADERS if i in request.headers}
+        async with self._session.get(f"https://{request.path_qs.lstrip('/')}", headers=headers) as response:
+            body = await response.text()
+        if response.status < 500 and response.status != 429:
+            self.fixtures.save(key, response.status, body)
+            self.stats["recorded"] += 1
+        return {"status": response.status, "body": body}
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        key = self.fixtures.key(request.path.lstrip("/"), request.query_string)
+        fixture = self.fixtures.load(key)
+
+        if fixture is None and self.record:
+            fixture = await self._forward(request, key)
+        if fixture is None:
+            self.stats["missing"] += 1
+            logging.warning(f"No fixture for {key}")
+            return web.json_response({"status": {"error_message": "fixture missing"}}, status=404)
+
+        self.stats["served"] += 1
+        return web.Response(text=fixture["body"], status=fixture["status"], content_type="application/json")
+
+    async def _start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/{tail:.*}", self._handle)
+        self._session = aiohttp.ClientSession()
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+
+        site = web.TCPSite(self._runner, "127.0.0.1", self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+
+    async def _stop(self) -> None:
+        await self._session.close()
+        await self._runner.cleanup()
+
+    def _run(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        self._loop.run_until_complete(self._start())
+        self._ready.set()
+        self._loop.run_forever()
+
+    def start(self) -> "ReplayServer":
+        threading.Thread(target=self._run, name="ReplayServer", daemon=True).start()
+        self._ready.wait()
+        return self
+
+    def stop(self) -> None:
+        asyncio.run_coroutine_threadsafe(self._stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
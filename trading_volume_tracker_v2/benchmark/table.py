@@ -0,0 +1,107 @@
+"""
+Benchmark of common.table against BeautifulTable on the tables the bots send:
+    PYTHONPATH=.. python -m benchmark.table --rows 10 --repeat 200
+
+Every case is rendered by both, the outputs have to match before the timings are reported.
+"""
+
+import argparse
+import timeit
+
+import numpy as np
+import pandas as pd
+from beautifultable import BeautifulTable
+from lib.utils import Formatter
+
+from common.table import render_table
+
+
+def init_args() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark the table renderer against BeautifulTable")
+    parser.add_argument("--rows", type=int, help="Rows per table", default=10)
+    parser.add_argument("--repeat", type=int, help="Renders per case", default=200)
+    return parser
+
+
+def init_cases(rows: int) -> dict:
+    """
+    {case: (BeautifulTable render, common.table render)}, shaped like the volume report, the announcement bot
+    permission table and the value monitor exposure table
+    """
+    rng = np.random.default_rng(0)
+    formatter = Formatter()
+
+    report = pd.DataFrame(
+        {
+            "Ccy": [f"TOKEN{i}" for i in range(rows)],
+            "Volume (USD)": formatter.millify_array(rng.lognormal(15, 3, rows)),
+            "Spot perc (%)": formatter.percent_array(rng.random(rows)),
+            "Cap rank": rng.integers(1, 3000, rows).astype(str),
+        }
+    )
+    permission = pd.DataFrame(
+        {
+            "name": [f"Group {i}" for i in range(rows)],
+            "type": rng.choice(["group", "supergroup", "channel"], rows),
+            "label": [str(["listing", "delisting"][: i % 3]) for i in range(rows)],
+            "operator": rng.choice(["alice", "bob"], rows),
+        }
+    )
+    exposure = pd.DataFrame(
+        {
+            "currency": [f"CCY{i}" for i in range(rows)],
+            "balance": rng.normal(0, 1e4, rows).round(3),
+            "lp": rng.lognormal(0, 3, rows).round(3),
+            "value": rng.normal(0, 1e6, rows).round(1),
+        }
+    )
+
+    def beautiful_table(df: pd.DataFrame, style=None, alignment=None, width=None) -> str:
+        table = BeautifulTable()
+        table.columns.header = df.columns.tolist()
+        for _, row in df.iterrows():
+            table.rows.append(row.tolist())
+        for column, align in (alignment or {}).items():
+            table.columns.alignment[column] = align
+        if style is not None:
+            table.set_style(style)
+        if width is not None:
+            table.columns.width = width
+        return str(table)
+
+    report_align = {"Ccy": BeautifulTable.ALIGN_LEFT} | {i: BeautifulTable.ALIGN_RIGHT for i in report.columns[1:]}
+    return {
+        "report": (
+            lambda: beautiful_table(report, BeautifulTable.STYLE_BOX, report_align, [8, 10, 10, 10]),
+            lambda: render_table(report, align=["left", "right", "right", "right"], widths=[8, 10, 10, 10]),
+        ),
+        "permission": (
+            lambda: beautiful_table(permission, BeautifulTable.STYLE_BOX),
+            lambda: render_table(permission),
+        ),
+        "exposure": (
+            lambda: beautiful_table(exposure),
+            lambda: render_table(exposure, style="default"),
+        ),
+    }
+
+
+def run(args: argparse.Namespace) -> dict:
+    results = {}
+    for case, (old, new) in init_cases(args.rows).items():
+        if old() != new():
+            raise AssertionError(f"{case}: common.table output differs from BeautifulTable")
+        old_seconds = timeit.timeit(old, number=args.repeat) / args.repeat
+        new_seconds = timeit.timeit(new, number=args.repeat) / args.repeat
+        results[case] = {"beautifultable": old_seconds, "table": new_seconds, "speedup": old_seconds / new_seconds}
+    return results
+
+
+if __name__ == "__main__":
+    args = init_args().parse_args()
+    print(f"{'case':<12}{'beautifultable ms':>20}{'table ms':>12}{'speedup':>10}")
+    for case, result in run(args).items():
+        print(
+            f"{case:<12}{result['beautifultable'] * 1000:>20.3f}{result['table'] * 1000:>12.3f}"
+            f"{result['speedup']:>9.1f}x"
+        )
@@ -1,5 +1,5 @@
 from lib.utils import BaseClient
-from pipeline.jobs import FillMongoDBJob, ListingJob, ReportJob, VolumeJob
+from pipeline.jobs import AnomalyJob, FillMongoDBJob, ListingJob, ReportJob, VolumeJob
 
 
 class JobManager(BaseClient):
@@ -12,6 +12,11 @@ class JobManager(BaseClient):
         if args.volume:
             job = VolumeJob(self.config)
             job.run(args.volume_num)
+            job = AnomalyJob(self.config)
+            job.run(test=args.test)
+        elif args.anomaly:
+            job = AnomalyJob(self.config)
+            job.run(date=args.date, test=args.test)
         elif args.listing:
             job = ListingJob(self.config)
             job.run()
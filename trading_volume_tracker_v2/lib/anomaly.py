@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+
+
+class VolumeAnomalyDetector:
+    """
+    Daily volume outliers of every token, computed on a date x symbol matrix at once.
+    - z-score of a day's log volume against the `window` days before it, from cumulative sums along the date axis
+    - day-over-day growth of the raw volume
+    A token is an outlier when its z-score or its growth passes the threshold and it traded at least `min_volume`.
+    """
+
+    def __init__(
+        self,
+        window: int = 28,
+        min_periods: int = 7,
+        z_threshold: float = 3.0,
+        growth_threshold: float = 1.0,
+        min_volume: float = 1e6,
+    ):
+        self.window = window
+        self.min_periods = min_periods
+        self.z_threshold = z_threshold
+        self.growth_threshold = growth_threshold
+        self.min_volume = min_volume
+
+    @staticmethod
+    def to_matrix(volume: pd.DataFrame, column: str) -> tuple:
+        """
+        Long (date, symbol, `column`) records to a dates x symbols matrix, records sharing a symbol on one date are
+        summed and missing records are NaN.
+        return: (dates, symbols, matrix)
+        """
+        volume = volume.groupby(["date", "symbol"], as_index=False)[column].sum()
+        dates, date_idx = np.unique(volume["date"].to_numpy(dtype=str), return_inverse=True)
+        symbols, symbol_idx = np.unique(volume["symbol"].to_numpy(dtype=str), return_inverse=True)
+
+        matrix = np.full((len(dates), len(symbols)), np.nan)
+        matrix[date_idx, symbol_idx] = volume[column].to_numpy(dtype=float)
+        return dates, symbols, matrix
+
+    def rolling_zscore(self, matrix: np.ndarray) -> np.ndarray:
+        """
+        z-score of every cell against the `window` rows before it, NaN cells are left out of the statistics.
+        """
+        values = np.log1p(np.clip(matrix, 0, None))
+        valid = np.isfinite(values)
+        values = np.where(valid, values, 0)
+
+        def trailing(x: np.ndarray) -> np.ndarray:
+            cumsum = np.vstack([np.zeros((1, x.shape[1])), np.cumsum(x, axis=0)])
+            end = np.arange(len(x))
+            start = np.maximum(end - self.window, 0)
+            return cumsum[end] - cumsum[start]
+
+        count = trailing(valid.astype(float))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = trailing(values) / count
+            std = np.sqrt(np.clip(trailing(values**2) / count - mean**2, 0, None))
+            zscore = (values - mean) / std
+
+        enough = valid & (count >= self.min_periods) & (std > 0)
+        return np.where(enough, zscore, np.nan)
+
+    @staticmethod
+    def growth(matrix: np.ndarray) -> np.ndarray:
+        """
+        Day-over-day growth of every cell, inf when the token had no volume the day before, NaN without a record.
+        """
+        previous = np.vstack([np.full((1, matrix.shape[1]), np.nan), matrix[:-1]])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(previous > 0, matrix / previous - 1, np.where(previous == 0, np.inf, np.nan))
+
+    def detect(self, volume: pd.DataFrame, column: str = "total_volume") -> pd.DataFrame:
+        """
+        Outliers of the last date in `volume`, which holds the date, symbol and `column` of the trailing days.
+        return: symbol, volume, growth and zscore of every outlier, sorted by z-score
+        """
+        columns = ["symbol", "volume", "growth", "zscore"]
+        if volume.empty:
+            return pd.DataFrame(columns=columns)
+
+        dates, symbols, matrix = self.to_matrix(volume, column)
+        last = pd.DataFrame(
+            {
+                "symbol": symbols,
+                "volume": matrix[-1],
+                "growth": self.growth(matrix)[-1],
+                "zscore": self.rolling_zscore(matrix)[-1],
+            }
+        )
+
+        outlier = (last["zscore"] >= self.z_threshold) | (last["growth"] >= self.growth_threshold)
+        return (
+            last[outlier & (last["volume"] >= self.min_volume)]
+            .sort_values(by="zscore", ascending=False, na_position="last")
+            .reset_index(drop=True)[columns]
+        )
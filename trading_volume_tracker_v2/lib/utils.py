@@ -1,21 +1,32 @@
 import argparse
+import asyncio
+import glob
 import json
 import logging
 import math
 import os
+import tempfile
+import time
+from collections import deque
 from datetime import datetime as dt
 from datetime import timedelta as td
 from decimal import Decimal
 from typing import Optional
+from urllib.parse import urlparse
 
+import aiohttp
 import matplotlib.ticker as ticker
 import numpy as np
 import pandas as pd
 import pymongo as pm
 import requests as rq
-from beautifultable import BeautifulTable
 from matplotlib import pyplot as plt
 
+from common.table import pre_table
+
+from .anomaly import VolumeAnomalyDetector
+from .volume_store import VolumeStore
+
 
 def send_message(token, message, chat_id):
     url = f"https://api.telegram.org/bot{token}/sendMessage?chat_id={chat_id}&" f"text={message}&parse_mode=HTML"
@@ -37,9 +48,10 @@ class BaseClient:
         parser.add_argument("--volume", action="store_true", help="Update trading volume")
         parser.add_argument("--volume_num", type=int, help="", default=1000)
         parser.add_argument("--listing", action="store_true", help="Update listing")
+        parser.add_argument("--anomaly", action="store_true", help="Alert on volume anomalies")
         parser.add_argument("--cleaning", action="store_true", help="Clean db")
         parser.add_argument("--report", action="store_true", help="Send weekly report")
-        parser.add_argument("--report_cat", type=str, help="", default="total")
+        parser.add_argument("--report_cat", type=str, help="total, spot, perpetual or all", default="total")
         parser.add_argument("--report_num", type=int, help="", default=10)
         parser.add_argument("--date", type=str, help="Date of the report")
         parser.add_argument("--fill_mongodb", action="store_true", help="Fill mongodb")
@@ -69,45 +81,65 @@ class Formatter:
 
         return f"{simplified_num}{millnames[millidx]}"
 
-    def create_bt_from_df(self, df: pd.DataFrame, name: str) -> str:
-        table = BeautifulTable()
-        table.columns.header = df.columns.to_list()
-
-        if name == "top":
-            for index, row in df.iterrows():
-                table.rows.append(
-                    [
-                        row[0],
-                        self.millify(row[1]),
-                        f"{int(row[2]*100)}%",
-                        self.millify(row[3], k=1),
-                    ]
-                )
+    @staticmethod
+    def millify_array(values, k: int = 3) -> np.ndarray:
+        """
+        Vectorized millify, formats a whole column at once with the same output as millify, NaN and inf become "-".
+        """
+        millnames = np.array(["", "K", "M", "B", "T"])
+        n = np.asarray(values, dtype=float)
+        finite = np.isfinite(n)
+        n = np.where(finite, n, 0)
+        magnitude = np.abs(n)
+
+        with np.errstate(divide="ignore"):
+            millidx = np.floor(np.where(n == 0, 0, np.log10(np.where(n == 0, 1, magnitude)) / 3))
+        millidx = np.clip(millidx, 0, len(millnames) - 1).astype(int)
+
+        simplified_num = n / 10.0 ** (3 * millidx)
+        with np.errstate(divide="ignore"):
+            int_length = np.where(np.abs(simplified_num) >= 1, np.floor(np.log10(np.abs(simplified_num))) + 1, 1)
+        int_length = int_length.astype(int) + (simplified_num < 0)
+        digit = np.maximum(k - int_length, 0)
+
+        text = np.empty(n.shape, dtype=object)
+        for d in np.unique(digit):
+            mask = digit == d
+            formatted = np.char.mod(f"%.{d}f", np.round(simplified_num[mask], d))
+            if d > 0:
+                formatted = np.char.rstrip(np.char.rstrip(formatted, "0"), ".")
+            text[mask] = formatted
+
+        return np.where(finite, np.char.add(text.astype(str), millnames[millidx]), "-")
 
-        elif name == "new":
-            for index, row in df.iterrows():
-                table.rows.append(
-                    [
-                        row[0],
-                        self.millify(row[1]),
-                        "-" if row[2] == np.inf else f"{int(row[2]*100)}%",
-                        self.millify(row[3], k=1),
-                    ]
-                )
+    @staticmethod
+    def decimal_array(values, digits: int = 1) -> np.ndarray:
+        values = np.asarray(values, dtype=float)
+        finite = np.isfinite(values)
+        return np.where(finite, np.char.mod(f"%.{digits}f", np.where(finite, values, 0)), "-")
 
-        for i in range(len(df.columns)):
-            if i == 0:
-                table.columns.alignment[df.columns[i]] = BeautifulTable.ALIGN_LEFT
-            else:
-                table.columns.alignment[df.columns[i]] = BeautifulTable.ALIGN_RIGHT
+    @staticmethod
+    def percent_array(values, inf: Optional[str] = None) -> np.ndarray:
+        values = np.asarray(values, dtype=float)
+        finite = np.isfinite(values)
+        text = np.char.add(np.trunc(np.where(finite, values, 0) * 100).astype(int).astype(str), "%")
+        return np.where(finite, text, inf) if inf is not None else text
 
-        table.set_style(BeautifulTable.STYLE_BOX)
+    def create_bt_from_df(self, df: pd.DataFrame, name: str) -> str:
+        columns = [
+            df.iloc[:, 0].astype(str).to_numpy(),
+            self.millify_array(df.iloc[:, 1]),
+            self.percent_array(df.iloc[:, 2], inf="-" if name in ["new", "anomaly"] else None),
+            self.decimal_array(df.iloc[:, 3]) if name == "anomaly" else self.millify_array(df.iloc[:, 3], k=1),
+        ]
 
         data_width = 32 // (len(df.columns) - 1)
-        table.columns.width = [8] + [data_width] * (len(df.columns) - 1)
-
-        table_text = f"<pre>{table}</pre>"
-        return table_text
+        return pre_table(
+            [i.tolist() for i in columns],
+            header=df.columns.to_list(),
+            align=["left"] + ["right"] * (len(df.columns) - 1),
+            widths=[8] + [data_width] * (len(df.columns) - 1),
+        )
 
 
 class Grabber(BaseClient):
@@ -138,6 +170,13 @@ class Grabber(BaseClient):
                     logging.warning(f"{kwargs['symbol']} KeyError: {e}")
                     return pd.DataFrame()
 
+            elif category == "market_pairs":
+                try:
+                    return response["data"]["marketPairs"]
+                except KeyError as e:
+                    logging.warning(f"{kwargs['symbol']} KeyError: {e}")
+                    return []
+
             elif category == "market_number":
                 return int(response["data"]["numMarketPairs"])
 
@@ -160,6 +199,8 @@ class Grabber(BaseClient):
                 return pd.DataFrame()
             elif category == "market_number":
                 return 0
+            elif category == "market_pairs":
+                return []
             elif category == "listing":
                 return []
 
@@ -277,22 +318,400 @@ class Grabber(BaseClient):
         return self._handle_response(response=response, category="woo_listing")
 
 
+class VolumeAggregator:
+    """
+    Streaming reduction of CMC market pair pages. Every page is folded into a (token x exchange) volume matrix per
+    category as soon as it arrives, so token totals are row sums and the per-exchange breakdown comes for free.
+    """
+
+    def __init__(self, tokens: list, cats: list, capacity: int = 256):
+        self.tokens = tokens
+        self.exchanges = {}
+        self.volume = {cat: np.zeros((len(tokens), capacity)) for cat in cats}
+
+    def _exchange_index(self, names: list) -> np.ndarray:
+        for name in names:
+            if name not in self.exchanges:
+                self.exchanges[name] = len(self.exchanges)
+
+        capacity = next(iter(self.volume.values())).shape[1]
+        if len(self.exchanges) > capacity:
+            pad = max(capacity, len(self.exchanges) - capacity)
+            self.volume = {cat: np.pad(matrix, ((0, 0), (0, pad))) for cat, matrix in self.volume.items()}
+
+        return np.fromiter((self.exchanges[i] for i in names), dtype=int, count=len(names))
+
+    def add(self, cat: str, row: int, pairs: list) -> float:
+        if not pairs:
+            return 0
+        index = self._exchange_index([i.get("exchangeName", "unknown") for i in pairs])
+        volume = np.nan_to_num(np.array([i.get("volumeUsd") for i in pairs], dtype=float))
+        np.add.at(self.volume[cat][row], index, volume)
+        return volume.sum()
+
+    def token_volume(self, cat: str) -> np.ndarray:
+        return self.volume[cat].sum(axis=1)
+
+    def breakdown(self, cat: str) -> pd.DataFrame:
+        """
+        return: DataFrame with the tokens as index and the exchanges as columns
+        """
+        return pd.DataFrame(self.volume[cat][:, : len(self.exchanges)], index=self.tokens, columns=list(self.exchanges))
+
+    def exchange_volume(self) -> pd.DataFrame:
+        """
+        return: DataFrame with the exchanges as index and one total volume column per category
+        """
+        return pd.DataFrame({cat: self.breakdown(cat).sum(axis=0) for cat in self.volume})
+
+
+class RateGovernor:
+    """
+    Adaptive request rate for one API.
+    - at most `rate` requests are started in any `window` seconds
+    - a 429 / 5xx halves the rate, every `rate` successes in a row raise it by one again up to `max_rate`
+    - the retry delay grows exponentially with the attempt, or follows Retry-After when the server sends it
+    """
+
+    BASE_DELAY = 1
+    MAX_DELAY = 60
+
+    def __init__(self, rate: int, window: float = 60, min_rate: int = 1):
+        self.rate = self.max_rate = rate
+        self.window = window
+        self.min_rate = min_rate
+        self.started = deque()
+        self.successes = 0
+        self.throttled = 0
+        self.lock = asyncio.Lock()
+
+    def set_rate(self, rate: int) -> None:
+        self.rate = self.max_rate = max(self.min_rate, rate)
+
+    async def acquire(self) -> None:
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                while self.started and now - self.started[0] >= self.window:
+                    self.started.popleft()
+                if len(self.started) < self.rate:
+                    self.started.append(now)
+                    return
+                await asyncio.sleep(self.window - (now - self.started[0]))
+
+    def on_success(self) -> None:
+        self.successes += 1
+        if self.rate < self.max_rate and self.successes >= self.rate:
+            self.rate += 1
+            self.successes = 0
+
+    def on_throttle(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        self.rate = max(self.min_rate, self.rate // 2)
+        self.successes = 0
+        self.throttled += 1
+        try:
+            return min(self.MAX_DELAY, float(retry_after))
+        except (TypeError, ValueError):
+            return min(self.MAX_DELAY, self.BASE_DELAY * 2**attempt)
+
+
+class AsyncGrabber(Grabber):
+    """
+    Asyncio version of Grabber.get_token_info, all slugs and categories are crawled concurrently through one
+    pooled aiohttp session with at most MAX_CONCURRENCY requests in flight.
+    Responses are memoised by url for the length of a run, so a url is requested once no matter how many
+    callers ask for it, and the first volume page doubles as the market number probe. The memo is cleared when the
+    run ends.
+    Pages are reduced into a VolumeAggregator as they arrive, after a run `aggregator` holds the per-exchange
+    volume breakdown of every token.
+    Every host has a RateGovernor, 429 / 5xx responses are retried with backoff, and the pro-api credits of a run
+    are planned from the key info before the crawl starts.
+    """
+
+    MAX_CONCURRENCY = 16
+    TIMEOUT = 30
+    PAGE_LIMIT = 1000
+    MAX_RETRIES = 5
+
+    KEY_INFO_URL = "https://pro-api.coinmarketcap.com/v1/key/info"
+    # listings/latest costs 1 credit per 200 tokens returned
+    TOKENS_PER_CREDIT = 200
+    # requests per minute, pro-api is updated from the key's plan, data-api adapts from here
+    PRO_API_RATE = 30
+    DATA_API_RATE = 300
+
+    def __init__(self):
+        super().__init__()
+        self.semaphore = None
+        self.aggregator = None
+        self.governors = {}
+        self.credits = {}
+        self.responses = {}
+        self.requests = {"sent": 0, "reused": 0}
+        self.tokens = {"planned": [], "failed": set()}
+
+    def _start_run(self):
+        self.semaphore = asyncio.Semaphore(self.MAX_CONCURRENCY)
+        self.governors = {
+            self._api(self.TOKEN_INFO_URL): RateGovernor(rate=self.PRO_API_RATE),
+            self._api(self._create_volume_url(slug="")): RateGovernor(rate=self.DATA_API_RATE),
+        }
+        self.credits = {"left": None, "planned": 0, "used": 0}
+        self.responses = {}
+        self.requests = {"sent": 0, "reused": 0}
+        self.tokens = {"planned": [], "failed": set()}
+
+    @staticmethod
+    def _api(url: str) -> str:
+        """
+        Rate limit key of a url, its host and first path segment (pro-api /v1, data-api /data-api).
+        """
+        url = urlparse(url)
+        return f"{url.netloc}/{url.path.split('/')[1]}"
+
+    def _pro_api_headers(self) -> dict:
+        return {
+            "Accepts": "application/json",
+            "X-CMC_PRO_API_KEY": self.config[self.CMC_API_KEY],
+        }
+
+    def _count_credits(self, response: dict) -> dict:
+        if isinstance(response, dict) and isinstance(response.get("status"), dict):
+            self.credits["used"] += response["status"].get("credit_count") or 0
+        return response
+
+    async def _fetch(self, session: aiohttp.ClientSession, url: str, **kwargs) -> Optional[dict]:
+        """
+        return: the json body, None when the request still fails after MAX_RETRIES
+        """
+        api = self._api(url)
+        if api not in self.governors:
+            self.governors[api] = RateGovernor(rate=self.DATA_API_RATE)
+        governor = self.governors[api]
+
+        for attempt in range(self.MAX_RETRIES + 1):
+            await governor.acquire()
+            async with self.semaphore:
+                self.requests["sent"] += 1
+                try:
+                    async with session.get(url, **kwargs) as response:
+                        if response.status == 429 or response.status >= 500:
+                            error, retry_after = response.status, response.headers.get("Retry-After")
+                        else:
+                            # an html error page behind a 200 fails to parse and is retried like a 5xx
+                            body = await response.json(content_type=None)
+                            governor.on_success()
+                            return self._count_credits(body)
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                    error, retry_after = repr(e), None
+
+            if attempt < self.MAX_RETRIES:
+                delay = governor.on_throttle(attempt, retry_after)
+                logging.warning(f"Request failed ({error}), retry in {delay:.0f}s at {governor.rate}/min: {url}")
+                await asyncio.sleep(delay)
+
+        logging.error(f"Request failed after {self.MAX_RETRIES} retries ({error}): {url}")
+        return None
+
+    async def _plan_run(self, session: aiohttp.ClientSession, num: int) -> int:
+        """
+        Read the rate limit and the credits left of the pro-api key, the pro-api governor follows the plan's rate
+        and the token number is cut down to what the credits left can pay for.
+        return: number of tokens to crawl
+        """
+        response = await self._get(session, self.KEY_INFO_URL, headers=self._pro_api_headers())
+        try:
+            plan, usage = response["data"]["plan"], response["data"]["usage"]
+        except (KeyError, TypeError):
+            logging.warning(f"Unable to read CMC key info, crawl without a credit plan: {response}")
+            return num
+
+        self.governors[self._api(self.KEY_INFO_URL)].set_rate(plan["rate_limit_minute"])
+        credits_left = [usage[i]["credits_left"] for i in ["current_day", "current_month"]]
+        credits_left = min([i for i in credits_left if i is not None], default=None)
+
+        self.credits["left"] = credits_left
+        self.credits["planned"] = math.ceil(num / self.TOKENS_PER_CREDIT)
+        if credits_left is not None and self.credits["planned"] > credits_left:
+            logging.warning(f"{credits_left} CMC credits left, token number cut from {num}")
+            num = credits_left * self.TOKENS_PER_CREDIT
+            self.credits["planned"] = credits_left
+
+        logging.info(
+            f"CMC plan: {plan['rate_limit_minute']}/min, {credits_left} credits left, "
+            f"run needs {self.credits['planned']}"
+        )
+        return num
+
+    async def _get(self, session: aiohttp.ClientSession, url: str, **kwargs) -> dict:
+        key = (url, tuple(sorted(kwargs.get("params", {}).items())))
+        if key in self.responses:
+            self.requests["reused"] += 1
+        else:
+            self.responses[key] = asyncio.ensure_future(self._fetch(session, url, **kwargs))
+        return await self.responses[key]
+
+    async def _get_token_info(self, session: aiohttp.ClientSession, num: int) -> pd.DataFrame:
+        params = {"start": "1", "limit": num, "convert": "USD"}
+        response = await self._get(session, self.TOKEN_INFO_URL, params=params, headers=self._pro_api_headers())
+        return self._handle_response(response=response, category="token_info", num=num)
+
+    async def _add_page(self, session: aiohttp.ClientSession, url: str, token: str, row: int, cat: str) -> float:
+        response = await self._get(session, url)
+        if not response:
+            self.tokens["failed"].add(token)
+        pairs = self._handle_response(response=response, category="market_pairs", symbol=token)
+        return self.aggregator.add(cat=cat, row=row, pairs=pairs)
+
+    async def _get_token_stats(self, session: aiohttp.ClientSession, token: str, row: int, cat: str) -> tuple:
+        url = self._create_volume_url(slug=token, start=1, limit=self.PAGE_LIMIT, cat=cat)
+        first_page = await self._get(session, url)
+        if not first_page:
+            self.tokens["failed"].add(token)
+
+        market_number = self._handle_response(response=first_page, category="market_number")
+        logging.info(f"Token: {token} - Cat: {cat} - Market Number: {market_number}")
+        if market_number == 0:
+            return 0, 0
+
+        volume = self.aggregator.add(
+            cat=cat, row=row, pairs=self._handle_response(response=first_page, category="market_pairs", symbol=token)
+        )
+        urls = [
+            self._create_volume_url(slug=token, start=start, limit=self.PAGE_LIMIT, cat=cat)
+            for start in range(1 + self.PAGE_LIMIT, market_number + 1, self.PAGE_LIMIT)
+        ]
+        volume += sum(await asyncio.gather(*[self._add_page(session, url, token, row, cat) for url in urls]))
+        logging.info(f"Token: {token} - Cat: {cat} - Volume: {volume}")
+        return volume, market_number
+
+    async def _get_token_record(self, session: aiohttp.ClientSession, record: dict, row: int, cats: list) -> dict:
+        stats = await asyncio.gather(
+            *[self._get_token_stats(session, token=record["slug"], row=row, cat=cat) for cat in cats]
+        )
+        for cat, (volume, market_number) in zip(cats, stats):
+            record[f"{cat}_volume"] = float(volume)
+            record[f"{cat}_market_num"] = int(market_number)
+        record["updated_time"] = dt.now().strftime("%Y-%m-%d %H:%M:%S")
+        return record
+
+    async def crawl(
+        self,
+        num: Optional[int] = 1000,
+        done: Optional[list] = None,
+        on_chunk: Optional[callable] = None,
+        chunk_size: Optional[int] = 100,
+    ) -> pd.DataFrame:
+        """
+        Crawl the spot and perpetual volume of the top `num` tokens.
+        param done: slugs to skip, e.g. the ones a previous, interrupted run already saved
+        param on_chunk: called off the event loop with a list of finished token records every `chunk_size` tokens
+        return: the crawled records in cmc rank order, without the percentage and rank columns, empty when the run
+        is aborted for lack of credits or token info
+        After a run `tokens["planned"]` holds the slugs of the run (done ones included) and `tokens["failed"]` the
+        slugs with a request that failed for good, whose records are left out of the results and `on_chunk`.
+        """
+        self._start_run()
+        connector = aiohttp.TCPConnector(limit=self.MAX_CONCURRENCY)
+        timeout = aiohttp.ClientTimeout(total=self.TIMEOUT)
+        done = set(done or [])
+
+        try:
+            async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+                num = await self._plan_run(session, num=num)
+                if num <= 0:
+                    logging.error(f"No CMC credits left ({self.credits['left']}), volume crawl aborted")
+                    return pd.DataFrame()
+                token_info = await self._get_token_info(session, num=num)
+                if token_info.empty:
+                    logging.error("CMC returned no token info, volume crawl aborted")
+                    return pd.DataFrame()
+                token_info.query(f"symbol not in {self.BLACK_LIST}", inplace=True)
+
+                cats = ["spot", "perpetual"]
+                records = token_info.to_dict("records")
+                self.tokens["planned"] = [record["slug"] for record in records]
+                self.aggregator = VolumeAggregator(tokens=token_info["symbol"].tolist(), cats=cats)
+                tasks = [
+                    self._get_token_record(session, record=record, row=row, cats=cats)
+                    for row, record in enumerate(records)
+                    if record["slug"] not in done
+                ]
+                logging.info(f"Crawling {len(tasks)} tokens, {len(records) - len(tasks)} already done")
+
+                results, chunk = [], []
+                for finished, task in enumerate(asyncio.as_completed(tasks), 1):
+                    record = await task
+                    if record["slug"] in self.tokens["failed"]:
+                        logging.warning(f"Token: {record['slug']} - request failed, left for the next run")
+                    else:
+                        chunk.append(record)
+                    if chunk and (len(chunk) >= chunk_size or finished == len(tasks)):
+                        if on_chunk is not None:
+                            await asyncio.to_thread(on_chunk, chunk)
+                        results += chunk
+                        chunk = []
+        finally:
+            # the memo only lives for the run
+            self.responses.clear()
+        logging.info(f"CMC requests: {self.requests['sent']} sent, {self.requests['reused']} reused")
+        logging.info(
+            f"CMC credits: {self.credits['used']} used, {self.credits['planned']} planned. Throttled: "
+            + ", ".join(f"{api} {governor.throttled}" for api, governor in self.governors.items())
+        )
+
+        order = {record["slug"]: row for row, record in enumerate(records)}
+        columns = list(token_info.columns) + [f"{cat}_{i}" for cat in cats for i in ["volume", "market_num"]]
+        return pd.DataFrame(sorted(results, key=lambda x: order[x["slug"]]), columns=columns + ["updated_time"])
+
+    @staticmethod
+    def add_volume_stats(token_info: pd.DataFrame) -> pd.DataFrame:
+        token_info = token_info.copy()
+        token_info["total_volume"] = token_info["spot_volume"] + token_info["perpetual_volume"]
+        token_info["spot_percentage"] = token_info["spot_volume"] / token_info["total_volume"]
+        token_info["perpetual_percentage"] = token_info["perpetual_volume"] / token_info["total_volume"]
+
+        token_info["spot_volume_rank"] = token_info["spot_volume"].rank(ascending=False)
+        token_info["perpetual_volume_rank"] = token_info["perpetual_volume"].rank(ascending=False)
+        token_info["total_volume_rank"] = token_info["total_volume"].rank(ascending=False)
+
+        return token_info.fillna(0)
+
+    async def get_token_info(self, num: Optional[int] = 1000) -> pd.DataFrame:
+        token_info = await self.crawl(num=num)
+        if token_info.empty:
+            return token_info
+        return self.add_volume_stats(token_info).set_index("symbol")
+
+
 class Tools(BaseClient, Formatter):
     VOLUME_DB_PATH = os.path.join(BaseClient.CURRENT_PATH, "../db/volume_db.csv")
     LISTING_DB_PATH = os.path.join(BaseClient.CURRENT_PATH, "../db/listing_db.csv")
     ARCHIVE_DB_PATH = os.path.join(BaseClient.CURRENT_PATH, "../db/archive")
+    VOLUME_STORE_PATH = os.path.join(BaseClient.CURRENT_PATH, "../db/volume_store")
     GCS_KEY_PATH = os.path.join(BaseClient.CURRENT_PATH, "gcs_key.json")
     ONLINE_VOLUME_DB_URL = (
         "https://docs.google.com/spreadsheets/d/1wfz0T-dtWScZ1WyrfSY2rjyV6kQ4CiCh07hywLZjLpQ/edit?usp=sharing"
     )
     MONGO_URL = "MONGO_URL"
 
+    WEEKLY_COLUMNS = ["total_volume", "spot_volume", "perpetual_volume", "cmc_rank"]
+    VOLUME_CHUNK_SIZE = 100
+    FILL_CHUNK_SIZE = 5000
+
+    REPORT_CATS = ["total", "spot", "perpetual"]
+
     TIER1_EXCHANGE = ["binance", "houbi", "okx"]
     TIER2_EXCHANGE = ["gate.io", "kraken", "coinbase", "crypto.com", "kucoin", "bitfinex", "bybit"]
 
     def __init__(self):
         self.config = self._init_config()
         self.mongo_client = self.init_mongo_client()
+        self.init_volume_indexes()
+        self.listing = None
+        self.listing_matrix = {}
+        self.weekly_volume = {}
+        self.volume_store = VolumeStore(self.VOLUME_STORE_PATH)
 
     def init_mongo_client(self) -> pm.MongoClient:
         return pm.MongoClient(self.config[self.MONGO_URL])
@@ -300,6 +719,14 @@ class Tools(BaseClient, Formatter):
     def init_collection(self, db: str, name: str) -> pm.collection.Collection:
         return self.mongo_client[db][name]
 
+    def clear_cache(self) -> None:
+        """
+        Drop the listing and weekly volume read for this run, called after either is written.
+        """
+        self.listing = None
+        self.listing_matrix.clear()
+        self.weekly_volume.clear()
+
     def get_logger(self, name: str) -> logging.Logger:
         log_paths = {
             "cleaning": os.path.join(BaseClient.CURRENT_PATH, "../log/cleaning/cleaning.log"),
@@ -321,8 +748,119 @@ class Tools(BaseClient, Formatter):
 
         return {"current_week": current_week, "last_week": last_week}
 
-    def _get_volume_record(self, dates: list) -> pd.DataFrame:
-        columns = [
+    def init_volume_indexes(self) -> None:
+        """
+        Indexes of TradingVolumeDB, created once per client.
+        - Volume (date, symbol, slug): the upsert key of save_volume_records and fill_mongodb, its date prefix serves
+          the date range $match / distinct of every read. Per-symbol history is read from the local volume store, so
+          the former (symbol, date) and (date, symbol) indexes are dropped.
+        - WeeklyVolume (week, symbol), unique: the $merge key of rebuild_weekly_volume and the upsert key of
+          update_weekly_volume.
+        """
+        volume = self.init_collection(db="TradingVolumeDB", name="Volume")
+        volume.create_index([("date", pm.ASCENDING), ("symbol", pm.ASCENDING), ("slug", pm.ASCENDING)])
+        for name in ["date_1_symbol_1", "symbol_1_date_1"]:
+            if name in volume.index_information():
+                volume.drop_index(name)
+
+        weekly = self.init_collection(db="TradingVolumeDB", name="WeeklyVolume")
+        weekly.create_index([("week", pm.ASCENDING), ("symbol", pm.ASCENDING)], unique=True)
+
+    def init_volume_collection(self) -> pm.collection.Collection:
+        return self.init_collection(db="TradingVolumeDB", name="Volume")
+
+    def save_volume_records(self, records: list) -> int:
+        """
+        Upsert volume records keyed on (date, symbol, slug), symbols alone are not unique on CMC.
+        Writes go out in unordered bulks of VOLUME_CHUNK_SIZE, so a rerun of the same day overwrites instead of
+        duplicating.
+        """
+        collection = self.init_volume_collection()
+        for i in range(0, len(records), self.VOLUME_CHUNK_SIZE):
+            requests = [
+                pm.UpdateOne(
+                    {"date": record["date"], "symbol": record["symbol"], "slug": record["slug"]},
+                    {"$set": record},
+                    upsert=True,
+                )
+                for record in records[i : i + self.VOLUME_CHUNK_SIZE]
+            ]
+            collection.bulk_write(requests, ordered=False)
+        return len(records)
+
+    def delete_volume_records(self, date: str) -> int:
+        """
+        Drop the Volume records of `date` before a fresh run of the day, so leftovers of an earlier run are not ranked
+        with the new ones. The local partition is kept until the run writes its own.
+        """
+        return self.init_volume_collection().delete_many({"date": date}).deleted_count
+
+    def get_daily_volume(self, date: str) -> pd.DataFrame:
+        collection = self.init_volume_collection()
+        return pd.DataFrame(collection.aggregate([self._match_dates([date]), {"$project": {"_id": 0}}]))
+
+    def get_volume_checkpoint(self, date: str) -> list:
+        """
+        Slugs already saved by an unfinished volume run of `date`. A finished (or missing) checkpoint starts a new run.
+        """
+        collection = self.init_collection(db="TradingVolumeDB", name="VolumeCheckpoint")
+        checkpoint = collection.find_one({"date": date})
+        if checkpoint and not checkpoint["finished"]:
+            return checkpoint["done"]
+
+        collection.update_one(
+            {"date": date},
+            {"$set": {"done": [], "finished": False, "started_time": dt.now().strftime("%Y-%m-%d %H:%M:%S")}},
+            upsert=True,
+        )
+        return []
+
+    def update_volume_checkpoint(self, date: str, slugs: list, finished: bool = False) -> None:
+        collection = self.init_collection(db="TradingVolumeDB", name="VolumeCheckpoint")
+        collection.update_one(
+            {"date": date},
+            {
+                "$addToSet": {"done": {"$each": slugs}},
+                "$set": {"finished": finished, "updated_time": dt.now().strftime("%Y-%m-%d %H:%M:%S")},
+            },
+        )
+
+    @staticmethod
+    def _match_dates(dates: list, **kwargs) -> dict:
+        """
+        `dates` is always a run of consecutive days, so it is matched as a range instead of an $in list.
+        """
+        return {"$match": {**kwargs, "date": {"$gte": min(dates), "$lte": max(dates)}}}
+
+    def _query_volume_record(self, dates: list, columns: list) -> pd.DataFrame:
+        collections = self.init_volume_collection()
+
+        pipeline = [self._match_dates(dates), {"$project": {"_id": 0, **{i: 1 for i in columns}}}]
+        return pd.DataFrame(collections.aggregate(pipeline), columns=columns)
+
+    def sync_volume_store(self, dates: list) -> list:
+        """
+        Mirror the Volume dates within the range of `dates` that the local store does not have yet. A date whose
+        VolumeCheckpoint is not finished is still being crawled and is left out, VolumeJob writes its partition once
+        every token is in. Dates without a checkpoint predate it and are complete.
+        return: the complete dates stored in Mongo within the range
+        """
+        collection = self.init_volume_collection()
+        stored = collection.distinct("date", self._match_dates(dates)["$match"])
+
+        checkpoints = self.init_collection(db="TradingVolumeDB", name="VolumeCheckpoint")
+        crawling = set(checkpoints.distinct("date", {**self._match_dates(dates)["$match"], "finished": False}))
+        stored = sorted(i for i in stored if i not in crawling)
+
+        local = set(self.volume_store.dates())
+        for date in stored:
+            if date not in local:
+                columns = ["symbol"] + self.volume_store.COLUMNS
+                self.volume_store.write_partition(date, self._query_volume_record([date], columns=columns))
+        return stored
+
+    def _get_volume_record(self, dates: list, columns: Optional[list] = None) -> pd.DataFrame:
+        columns = columns or [
             "symbol",
             "total_volume",
             "spot_volume",
@@ -330,30 +868,226 @@ class Tools(BaseClient, Formatter):
             "cmc_rank",
         ]
 
-        collections = self.init_collection(db="TradingVolumeDB", name="Volume")
-
-        filter_ = {"date": {"$in": dates}}
-        volume_db = pd.DataFrame(collections.find(filter_))[columns]
+        self.sync_volume_store(dates)
+        volume_db = self.volume_store.read(dates, columns=columns)
 
         return volume_db
 
-    def _get_exchange_listing(self, exchange: str, cat: Optional[str] = None) -> list:
+    def _get_mean_volume(self, dates: list) -> pd.DataFrame:
+        volume_db = self._get_volume_record(dates, columns=["symbol"] + self.WEEKLY_COLUMNS)
+        return volume_db.groupby("symbol").mean().reset_index()
+
+    @staticmethod
+    def get_week_start(date: str) -> str:
+        date = dt.strptime(date, "%Y-%m-%d")
+        return (date - td(days=date.weekday())).strftime("%Y-%m-%d")
+
+    def init_weekly_volume(self) -> pm.collection.Collection:
+        return self.init_collection(db="TradingVolumeDB", name="WeeklyVolume")
+
+    def _fold_day(self, date: str, day: Optional[dict]) -> list:
+        """
+        Update pipeline replacing the contribution of `date` in a rollup document (removing it when `day` is None),
+        then recomputing the sums, count and dates from all the days the document holds.
+        """
+        days = {
+            "$filter": {"input": {"$objectToArray": {"$ifNull": ["$days", {}]}}, "cond": {"$ne": ["$$this.k", date]}}
+        }
+        if day is not None:
+            days = {"$concatArrays": [days, [{"k": date, "v": {"$literal": day}}]]}
+
+        totals = {f"{col}_sum": {"$sum": f"$days.v.{col}"} for col in self.WEEKLY_COLUMNS}
+        return [
+            {"$set": {"days": days}},
+            {"$set": {**totals, "count": {"$sum": "$days.v.count"}, "dates": "$days.k"}},
+            {"$set": {"days": {"$arrayToObject": "$days"}}},
+        ]
 
-        collections = self.init_collection(db="TradingVolumeDB", name="ListingInfo")
-        filter_ = {"exchange": exchange} if cat == "total" else {"exchange": exchange, "type": cat}
-        return pd.DataFrame(collections.find(filter_))["symbol"].unique().tolist()
+    def update_weekly_volume(self, token_info: pd.DataFrame) -> int:
+        """
+        Fold daily volume records into the WeeklyVolume rollup, which keeps the sums and record count of every day
+        under `days.<date>` for every week (starting on Monday) and symbol, plus their totals. Folding a date again
+        replaces that day, so a rerun of the volume job leaves the week as if it ran once.
+        """
+        collection = self.init_weekly_volume()
+
+        requests = []
+        for date, records in token_info.groupby("date"):
+            week = self.get_week_start(date)
+            sums = records.groupby("symbol")[self.WEEKLY_COLUMNS].sum()
+            counts = records.groupby("symbol").size()
+            for symbol, row in sums.iterrows():
+                day = {**{col: float(row[col]) for col in self.WEEKLY_COLUMNS}, "count": int(counts[symbol])}
+                requests.append(
+                    pm.UpdateOne({"week": week, "symbol": symbol}, self._fold_day(date=date, day=day), upsert=True)
+                )
+
+            # symbols folded for this date by an earlier run that are gone from this one
+            requests.append(
+                pm.UpdateMany(
+                    {"week": week, "symbol": {"$nin": sums.index.tolist()}, f"days.{date}": {"$exists": True}},
+                    self._fold_day(date=date, day=None),
+                )
+            )
+
+        if requests:
+            collection.bulk_write(requests, ordered=False)
+        self.weekly_volume.clear()
+        return len(requests)
+
+    def rebuild_weekly_volume(self, dates: list) -> None:
+        """
+        Recompute the rollup of one full week from the daily records, used for weeks stored before the rollup existed.
+        """
+        week = self.get_week_start(dates[0])
+        self.init_weekly_volume().delete_many({"week": week})
+
+        pipeline = [
+            self._match_dates(dates),
+            {
+                "$group": {
+                    "_id": {"symbol": "$symbol", "date": "$date"},
+                    **{i: {"$sum": f"${i}"} for i in self.WEEKLY_COLUMNS},
+                    "count": {"$sum": 1},
+                }
+            },
+            {
+                "$group": {
+                    "_id": "$_id.symbol",
+                    **{f"{i}_sum": {"$sum": f"${i}"} for i in self.WEEKLY_COLUMNS},
+                    "count": {"$sum": "$count"},
+                    "dates": {"$push": "$_id.date"},
+                    "days": {
+                        "$push": {
+                            "k": "$_id.date",
+                            "v": {**{i: f"${i}" for i in self.WEEKLY_COLUMNS}, "count": "$count"},
+                        }
+                    },
+                }
+            },
+            {"$set": {"symbol": "$_id", "week": week, "days": {"$arrayToObject": "$days"}}},
+            {"$project": {"_id": 0}},
+            {"$merge": {"into": "WeeklyVolume", "on": ["week", "symbol"], "whenMatched": "replace"}},
+        ]
+        self.init_volume_collection().aggregate(pipeline)
+
+    def get_weekly_volume(self, dates: list) -> pd.DataFrame:
+        """
+        Mean of WEEKLY_COLUMNS per symbol over `dates`, one week or its first days.
+        Read from the WeeklyVolume rollup when it holds exactly the stored dates, otherwise computed from the daily
+        records (and written back to the rollup when `dates` is a full week). Cached for the run, so reports of every
+        category share one read.
+        """
+        key = tuple(dates)
+        if key not in self.weekly_volume:
+            self.weekly_volume[key] = self._load_weekly_volume(dates)
+        return self.weekly_volume[key].copy()
+
+    def _load_weekly_volume(self, dates: list) -> pd.DataFrame:
+        week = self.get_week_start(dates[0])
+        rollup = pd.DataFrame(self.init_collection(db="TradingVolumeDB", name="WeeklyVolume").find({"week": week}))
+        stored = self.sync_volume_store(dates)
+        if "count" in rollup:
+            rollup = rollup[rollup["count"] > 0].copy()
+        folded = sorted(set(rollup["dates"].explode())) if "dates" in rollup else []
+
+        if stored and folded == stored:
+            for col in self.WEEKLY_COLUMNS:
+                rollup[col] = rollup[f"{col}_sum"] / rollup["count"]
+            return rollup[["symbol"] + self.WEEKLY_COLUMNS]
+
+        logging.info(f"Weekly rollup of {week} does not cover {dates[0]}~{dates[-1]}, reading daily records")
+        if stored and len(dates) == 7:
+            self.rebuild_weekly_volume(dates)
+        return self._get_mean_volume(dates)
+
+    def get_volume_anomalies(
+        self, date: str, cat: str = "total", detector: VolumeAnomalyDetector = None
+    ) -> pd.DataFrame:
+        """
+        Volume outliers on `date` (%Y-%m-%d) among the tokens unlisted on WOO, scored against the trailing window of
+        the local volume store.
+        """
+        detector = detector or VolumeAnomalyDetector()
+        end = dt.strptime(date, "%Y-%m-%d")
+        dates = [(end - td(days=i)).strftime("%Y-%m-%d") for i in range(detector.window, -1, -1)]
+
+        self.sync_volume_store(dates)
+        volume = self.volume_store.read(dates, columns=["date", "symbol", f"{cat}_volume"])
+        if date not in set(volume["date"]):
+            return pd.DataFrame(columns=["symbol", "volume", "growth", "zscore"])
+
+        excluded = self._get_exchange_listing("WOO", cat) + self.BLACK_LIST
+        anomalies = detector.detect(volume, column=f"{cat}_volume")
+        return anomalies[~anomalies["symbol"].isin(excluded)].reset_index(drop=True)
+
+    def get_listing_matrix(self, cat: Optional[str] = None) -> pd.DataFrame:
+        """
+        Boolean symbol x exchange listing matrix, the matrices of every category are built from a single ListingInfo
+        query and cached for the run.
+        param cat: spot or perpetual, total (or None / all, as ReportJob names it) for every category
+        """
+        cat = "total" if cat in [None, "all"] else cat
+        if self.listing is None:
+            columns = ["symbol", "exchange", "type"]
+            collections = self.init_collection(db="TradingVolumeDB", name="ListingInfo")
+            self.listing = pd.DataFrame(collections.find({}, {"_id": 0, **{i: 1 for i in columns}}), columns=columns)
+
+        if cat not in self.listing_matrix:
+            listing = self.listing if cat == "total" else self.listing[self.listing["type"] == cat]
+            self.listing_matrix[cat] = pd.crosstab(listing["symbol"], listing["exchange"]).astype(bool)
+        return self.listing_matrix[cat]
+
+    def update_listing(self, listing_db: pd.DataFrame) -> dict:
+        """
+        Apply only the difference between `listing_db` and the stored ListingInfo, rows are keyed on
+        (exchange, symbol, type). Removals are limited to the exchange and type pairs present in `listing_db`, so an
+        exchange that failed to crawl is not delisted. Every change is appended to ListingHistory with a timestamp.
+        return: {"added": number of added rows, "removed": number of removed rows}
+        """
+        key = ["exchange", "symbol", "type"]
+        collection = self.init_collection(db="TradingVolumeDB", name="ListingInfo")
+        history = self.init_collection(db="TradingVolumeDB", name="ListingHistory")
+
+        listing_db = listing_db.reindex(columns=key).dropna().astype(str).drop_duplicates()
+        if listing_db.empty:
+            logging.warning("Listing crawl returned no rows, ListingInfo left unchanged")
+            return {"added": 0, "removed": 0}
+
+        stored = pd.DataFrame(collection.find({}, {"_id": 0, **{i: 1 for i in key}}), columns=key)
+        stored = stored.astype(str).drop_duplicates()
+        diff = stored.merge(listing_db, on=key, how="outer", indicator=True)
+
+        crawled = listing_db[["exchange", "type"]].drop_duplicates()
+        added = diff.query("_merge == 'right_only'")[key]
+        removed = diff.query("_merge == 'left_only'")[key].merge(crawled, on=["exchange", "type"])
+
+        if not added.empty:
+            collection.insert_many(added.to_dict("records"))
+        if not removed.empty:
+            collection.bulk_write([pm.DeleteMany(i) for i in removed.to_dict("records")], ordered=False)
+
+        changes = pd.concat([added.assign(action="add"), removed.assign(action="remove")], axis=0)
+        if not changes.empty:
+            changes["time"] = dt.now()
+            history.insert_many(changes.to_dict("records"))
+
+        self.clear_cache()
+        return {"added": len(added), "removed": len(removed)}
+
+    def _get_exchange_listing(self, exchange: str, cat: Optional[str] = None) -> list:
+        matrix = self.get_listing_matrix(cat)
+        return matrix.index[matrix[exchange]].tolist() if exchange in matrix else []
 
     def get_unlisted_token_with_top_volume(self, date: str, cat: str) -> pd.DataFrame:
         date_dict = self.get_dates_dict(date)
-        woo_listing = self._get_exchange_listing("WOO", cat)
-        vol = self._get_volume_record(date_dict["current_week"])
+        excluded = self._get_exchange_listing("WOO", cat) + self.BLACK_LIST
+        vol = self.get_weekly_volume(date_dict["current_week"])
 
         vol = (
-            vol.query("symbol not in @woo_listing and symbol not in @self.BLACK_LIST")
-            .groupby("symbol")
-            .mean()
+            vol[~vol["symbol"].isin(excluded)]
             .sort_values(by=f"{cat}_volume", ascending=False)
-            .reset_index()
+            .reset_index(drop=True)
             .query(f"{cat}_volume > 0")
             .eval(
                 f"{'spot' if cat == 'total' else cat}_percentage = "
@@ -361,7 +1095,7 @@ class Tools(BaseClient, Formatter):
             )
         )
 
-        vol["tier"] = vol["symbol"].apply(lambda x: self._get_token_tiers(symbol=x, cat=cat))
+        vol["tier"] = self.get_token_tiers(symbols=vol["symbol"], cat=cat)
 
         if cat == "total":
             columns_map = {
@@ -384,17 +1118,15 @@ class Tools(BaseClient, Formatter):
 
     def get_new_tokens_in_top_volume(self, date: str, cat: str, num: int) -> pd.DataFrame:
         date_dict = self.get_dates_dict(date)
-        woo_listing = self._get_exchange_listing("WOO", cat)
-        vol = self._get_volume_record(date_dict["current_week"])
-        last_vol = self._get_volume_record(date_dict["last_week"])
+        excluded = self._get_exchange_listing("WOO", cat) + self.BLACK_LIST
+        vol = self.get_weekly_volume(date_dict["current_week"])
+        last_vol = self.get_weekly_volume(date_dict["last_week"])
 
         # exclude woo listing and black list and calculate mean value
         vol = (
-            vol.query("symbol not in @woo_listing and symbol not in @self.BLACK_LIST")
-            .groupby("symbol")
-            .mean()
+            vol[~vol["symbol"].isin(excluded)]
             .sort_values(by=f"{cat}_volume", ascending=False)
-            .reset_index()
+            .reset_index(drop=True)
             .query(f"{cat}_volume > 0")
             .eval(
                 f"{'spot' if cat == 'total' else cat}_percentage = "
@@ -403,11 +1135,9 @@ class Tools(BaseClient, Formatter):
             .iloc[:num]
         )
         last_vol = (
-            last_vol.query("symbol not in @woo_listing and symbol not in @self.BLACK_LIST")
-            .groupby("symbol")
-            .mean()
+            last_vol[~last_vol["symbol"].isin(excluded)]
             .sort_values(by=f"{cat}_volume", ascending=False)
-            .reset_index()
+            .reset_index(drop=True)
             .query(f"{cat}_volume > 0")
             .eval(
                 f"{'spot' if cat == 'total' else cat}_percentage = "
@@ -417,15 +1147,18 @@ class Tools(BaseClient, Formatter):
         last_vol_currency = last_vol["symbol"].tolist()[:num]
 
         # get new currency in this week
-        new_tokens = vol.query("symbol not in @last_vol_currency")
-        new_tokens[f"last_{cat}_volume"] = new_tokens["symbol"].apply(
-            lambda x: last_vol.query("symbol == @x")[f"{cat}_volume"].values[0]
-            if x in last_vol["symbol"].tolist()
-            else 0
+        new_tokens = (
+            vol.query("symbol not in @last_vol_currency")
+            .merge(
+                last_vol[["symbol", f"{cat}_volume"]].rename(columns={f"{cat}_volume": f"last_{cat}_volume"}),
+                on="symbol",
+                how="left",
+            )
+            .fillna({f"last_{cat}_volume": 0})
         )
 
         new_tokens = new_tokens.eval(f"{cat}_growth_rate = {cat}_volume / last_{cat}_volume - 1")
-        new_tokens["tier"] = new_tokens["symbol"].apply(lambda x: self._get_token_tiers(symbol=x, cat=cat))
+        new_tokens["tier"] = self.get_token_tiers(symbols=new_tokens["symbol"], cat=cat)
 
         columns_map = {
             "symbol": "Ccy",
@@ -437,29 +1170,19 @@ class Tools(BaseClient, Formatter):
 
         return new_tokens[list(columns_map.keys())].rename(columns=columns_map)
 
-    def _get_token_tiers(self, symbol: str, cat: str) -> int:
+    def get_token_tiers(self, symbols: pd.Series, cat: str) -> np.ndarray:
         """
         Tier definition:
         Tier 1: list on 2 of the 3 exchanges (Binance, Huobi, OKX)
         Tier 2: list on 1 of the 3 exchanges (Binance, Huobi, OKX) and 3 of the other exchanges
         """
+        matrix = self.get_listing_matrix(cat).reindex(
+            index=symbols, columns=self.TIER1_EXCHANGE + self.TIER2_EXCHANGE, fill_value=False
+        )
+        tier1 = matrix[self.TIER1_EXCHANGE].sum(axis=1).to_numpy()
+        tier2 = matrix[self.TIER2_EXCHANGE].sum(axis=1).to_numpy()
 
-        tier1 = []
-        for i in self.TIER1_EXCHANGE:
-            if symbol in self._get_exchange_listing(i, cat):
-                tier1.append(i)
-
-        tier2 = []
-        for i in self.TIER2_EXCHANGE:
-            if symbol in self._get_exchange_listing(i, cat):
-                tier2.append(i)
-
-        if len(tier1) >= 2:
-            return 1
-        elif len(tier1) == 1 and len(tier2) >= 3:
-            return 2
-        else:
-            return 3
+        return np.select([tier1 >= 2, (tier1 == 1) & (tier2 >= 3)], [1, 2], default=3)
 
     def fill_missing_symbol(self):
         volume_db = self.volume_db.copy()
@@ -481,73 +1204,154 @@ class Tools(BaseClient, Formatter):
         self.to_online_db(name="volume", data=new_volume_db, index=False)
         return True
 
-    def fill_mongodb(self, fill_type: str):
-        if fill_type == "volume":
-            volume_mongo_db = self.init_collection(db="TradingVolumeDB", name="Volume")
-            volume_csv_db = self.volume_db.copy()
-
-            date_lst = volume_csv_db["date"].unique().tolist()
-            for date in date_lst:
-                filter_ = {"date": date}
-                volume_mongo_db.delete_many(filter_)
-                volume_mongo_db.insert_many(volume_csv_db.query("date == @date").to_dict("records"))
+    def _load_csv(self, paths: list, collection: pm.collection.Collection, key: list, text: list) -> dict:
+        """
+        Stream CSV files into `collection` in chunks of FILL_CHUNK_SIZE rows, each chunk is one unordered bulk of
+        upserts keyed on `key`, so memory stays bounded and a reload overwrites instead of duplicating.
+        `text` columns are read as is, so symbols like NAN or TRUE are not parsed.
+        """
+        converters = {i: str for i in text}
+        rows, dates = 0, set()
+        start = time.monotonic()
+
+        for path in paths:
+            for chunk in pd.read_csv(path, chunksize=self.FILL_CHUNK_SIZE, converters=converters):
+                chunk = chunk.replace({"": None})
+                if "date" in chunk:
+                    dates.update(chunk["date"].dropna().unique())
+
+                requests = [
+                    pm.UpdateOne({i: record.get(i) for i in key}, {"$set": record}, upsert=True)
+                    for record in chunk.to_dict("records")
+                ]
+                if requests:
+                    collection.bulk_write(requests, ordered=False)
+                rows += len(requests)
+
+                elapsed = time.monotonic() - start
+                logging.info(f"{collection.name}: {rows} rows loaded, {rows / elapsed:.0f} rows/sec")
+
+        elapsed = time.monotonic() - start
+        return {
+            "files": len(paths),
+            "rows": rows,
+            "dates": sorted(dates),
+            "seconds": round(elapsed, 1),
+            "rows_per_sec": round(rows / elapsed) if elapsed else rows,
+        }
 
-            return len(date_lst)
+    def fill_mongodb(self, fill_type: str) -> dict:
+        if fill_type == "volume":
+            paths = [self.VOLUME_DB_PATH] if os.path.exists(self.VOLUME_DB_PATH) else []
+            paths += sorted(glob.glob(os.path.join(self.ARCHIVE_DB_PATH, "*.csv")))
+            text = ["date", "symbol", "slug", "name"]
+            result = self._load_csv(paths, self.init_volume_collection(), key=["date", "symbol", "slug"], text=text)
+
+            # loaded dates are re-read from mongo by the local store and the weekly rollups
+            for date in result["dates"]:
+                self.volume_store.remove_partition(date)
+            weeks = sorted({self.get_week_start(i) for i in result["dates"]})
+            self.init_weekly_volume().delete_many({"week": {"$in": weeks}})
+
+            self.weekly_volume.clear()
+            return result
         elif fill_type == "listing":
-            listing_mongo_db = self.init_collection(db="TradingVolumeDB", name="ListingInfo")
-            listing_csv_db = self.listing_db.copy()
-
-            exchange_lst = listing_csv_db["exchange"].unique().tolist()
-            for exchange in exchange_lst:
-                filter_ = {"exchange": exchange}
-                listing_mongo_db.delete_many(filter_)
-                listing_mongo_db.insert_many(listing_csv_db.query("exchange == @exchange").to_dict("records"))
+            paths = [self.LISTING_DB_PATH] if os.path.exists(self.LISTING_DB_PATH) else []
+            collection = self.init_collection(db="TradingVolumeDB", name="ListingInfo")
+            key = ["exchange", "symbol", "type"]
+            result = self._load_csv(paths, collection, key=key, text=key)
 
-            return len(exchange_lst)
+            self.clear_cache()
+            return result
 
     def get_historical_volume(self, currency: str, start: str, end: str) -> pd.DataFrame:
 
-        columns = ["date", "symbol", "total_volume", "spot_volume", "perpetual_volume"]
-        dates = pd.date_range(start=start, end=end).strftime("%Y-%m-%d").tolist()
-
-        collection = self.init_collection(db="TradingVolumeDB", name="Volume")
-        filter_ = {"symbol": currency, "date": {"$in": dates}}
-        return pd.DataFrame(collection.find(filter_)).sort_values(by="date")[columns]
+        self.sync_volume_store([start, end])
+        return self.volume_store.history(
+            currency, start, end, columns=["total_volume", "spot_volume", "perpetual_volume"]
+        )
 
 
 class ImageCreator(BaseClient, Formatter):
+    # Telegram downsizes photos to 1280px on the long side, a 12x8 inch figure at 120 dpi already fills it
+    DPI = 120
+    # seconds a cached plot is kept after its last render
+    PLOT_MAX_AGE = 7 * 24 * 3600
+
     def __init__(self):
         self.img_folder = self.CURRENT_PATH + "/../db/img/"
 
+    def get_plot_path(self, currency: str, volume: pd.DataFrame) -> str:
+        """
+        Cache path of a volume plot, keyed by currency, date range and a hash of the plotted data.
+        """
+        version = int(pd.util.hash_pandas_object(volume, index=False).to_numpy().sum(dtype=np.uint64))
+        start, end = volume["date"].iloc[0], volume["date"].iloc[-1]
+        return self.img_folder + f"{currency}_{start}_{end}_{version:x}_volume.png"
+
     # This function will create a volume plot for a specific currency with
     # total volume, spot volume and perpetual volume in time series.
-    def volume_plot(self, currency: str, volume: pd.DataFrame):
-        plt.style.use("seaborn")
+    def volume_plot(self, currency: str, volume: pd.DataFrame, fig_path: Optional[str] = None) -> str:
+        fig_path = fig_path or self.get_plot_path(currency, volume)
+        if os.path.exists(fig_path):
+            return fig_path
 
-        fig, ax = plt.subplots(figsize=(12, 8))
+        plt.style.use("seaborn-v0_8")
 
-        ax.plot(volume["date"], volume["total_volume"], label="Total Volume", color="blue", linewidth=2, linestyle="-")
-        ax.plot(volume["date"], volume["spot_volume"], label="Spot Volume", color="green", linewidth=2, linestyle="--")
-        ax.plot(
-            volume["date"],
-            volume["perpetual_volume"],
-            label="Perpetual Volume",
-            color="red",
-            linewidth=2,
-            linestyle="-.",
-        )
+        fig, ax = plt.subplots(figsize=(12, 8))
+        try:
+            ax.plot(
+                volume["date"], volume["total_volume"], label="Total Volume", color="blue", linewidth=2, linestyle="-"
+            )
+            ax.plot(
+                volume["date"], volume["spot_volume"], label="Spot Volume", color="green", linewidth=2, linestyle="--"
+            )
+            ax.plot(
+                volume["date"],
+                volume["perpetual_volume"],
+                label="Perpetual Volume",
+                color="red",
+                linewidth=2,
+                linestyle="-.",
+            )
 
-        ax.set_title(f'{volume["symbol"].values[0]} Volume', fontsize=14, fontweight="bold")
-        ax.set_xlabel("Date", fontsize=12)
-        ax.set_ylabel("Volume (USD)", fontsize=12)
-        ax.legend(fontsize=10, frameon=True)
+            ax.set_title(f'{volume["symbol"].values[0]} Volume', fontsize=14, fontweight="bold")
+            ax.set_xlabel("Date", fontsize=12)
+            ax.set_ylabel("Volume (USD)", fontsize=12)
+            ax.legend(fontsize=10, frameon=True)
 
-        ax.get_yaxis().set_major_formatter(ticker.FuncFormatter(lambda x, p: self.millify(x)))
+            ax.get_yaxis().set_major_formatter(ticker.FuncFormatter(lambda x, p: self.millify(x)))
 
-        ax.grid(True)
-        ax.set_facecolor("whitesmoke")
+            ax.grid(True)
+            ax.set_facecolor("whitesmoke")
 
-        fig_path = self.img_folder + f"{currency}_volume.png"
-        fig.savefig(fig_path, dpi=300)
+            # rendered aside and moved in whole, a concurrent reader never sees a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(fig_path), prefix=".", suffix=".png")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    fig.savefig(f, format="png", dpi=self.DPI)
+                os.replace(tmp_path, fig_path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+        finally:
+            plt.close(fig)
 
         return fig_path
+
+    def prune_plots(self, max_age: Optional[float] = None) -> int:
+        """
+        Remove cached plots (and temp files of interrupted renders) older than `max_age` seconds, meant to run outside
+        the plot workers, return the number of files removed.
+        """
+        max_age = self.PLOT_MAX_AGE if max_age is None else max_age
+        now = time.time()
+        removed = 0
+        for path in glob.glob(self.img_folder + "*_volume.png") + glob.glob(self.img_folder + ".*.png"):
+            try:
+                if now - os.path.getmtime(path) > max_age:
+                    os.remove(path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
@@ -0,0 +1,125 @@
+import errno
+import os
+import shutil
+import tempfile
+import time
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+class VolumeStore:
+    """
+    Local columnar mirror of TradingVolumeDB.Volume.
+    - one directory per date holding one .npy file per column, rows sorted by symbol
+    - partitions are opened memory-mapped, a symbol lookup is a binary search and its rows are views of the file
+    - a partition is written to a unique hidden directory, the old one is renamed aside, the new one renamed in and
+      the old one deleted, so readers never see a half-built partition and concurrent writers do not collide
+    """
+
+    COLUMNS = ["total_volume", "spot_volume", "perpetual_volume", "cmc_rank"]
+    # attempts of a read that races the swap of a partition
+    READ_ATTEMPTS = 3
+
+    def __init__(self, path: str):
+        self.path = path
+        self._partitions = {}
+        os.makedirs(path, exist_ok=True)
+
+    def dates(self) -> list:
+        return sorted(i for i in os.listdir(self.path) if not i.startswith("."))
+
+    def write_partition(self, date: str, volume: pd.DataFrame) -> None:
+        volume = volume.sort_values(by="symbol", kind="stable")
+
+        tmp = tempfile.mkdtemp(dir=self.path, prefix=f".{date}.")
+
+        np.save(os.path.join(tmp, "symbol.npy"), np.array(volume["symbol"].astype(str).tolist(), dtype=str))
+        for col in self.COLUMNS:
+            np.save(os.path.join(tmp, f"{col}.npy"), volume[col].to_numpy(dtype=float))
+
+        target = os.path.join(self.path, date)
+        asides = []
+        while True:
+            aside = f"{tmp}.old{len(asides)}"
+            try:
+                os.rename(target, aside)
+                asides.append(aside)
+            except FileNotFoundError:
+                pass
+            try:
+                os.rename(tmp, target)
+                break
+            except OSError as e:
+                # another writer moved its partition in between, move that one aside too
+                if e.errno not in (errno.ENOTEMPTY, errno.EEXIST):
+                    raise
+
+        for aside in asides:
+            shutil.rmtree(aside, ignore_errors=True)
+
+    def remove_partition(self, date: str) -> None:
+        shutil.rmtree(os.path.join(self.path, date), ignore_errors=True)
+        self._partitions.pop(date, None)
+
+    def partition(self, date: str) -> dict:
+        folder = os.path.join(self.path, date)
+        for attempt in range(self.READ_ATTEMPTS):
+            try:
+                stat = os.stat(folder)
+                version = stat.st_ino, stat.st_mtime_ns
+                cached = self._partitions.get(date)
+                if cached is None or cached[0] != version:
+                    columns = {col: np.load(os.path.join(folder, f"{col}.npy"), mmap_mode="r") for col in self.COLUMNS}
+                    columns["symbol"] = np.load(os.path.join(folder, "symbol.npy"), mmap_mode="r")
+                    self._partitions[date] = (version, columns)
+                return self._partitions[date][1]
+            except FileNotFoundError:
+                # the partition is being swapped, it is back after the writer's next rename
+                if attempt == self.READ_ATTEMPTS - 1:
+                    raise
+                time.sleep(0.01)
+
+    def read(self, dates: list, columns: Optional[list] = None) -> pd.DataFrame:
+        """
+        Rows of every stored date in `dates`, `columns` can be any of date, symbol and COLUMNS.
+        """
+        columns = columns or ["symbol"] + self.COLUMNS
+        stored = set(self.dates())
+
+        frames = []
+        for date in dates:
+            if date not in stored:
+                continue
+            partition = self.partition(date)
+            frame = {col: partition[col] for col in columns if col != "date"}
+            if "date" in columns:
+                frame["date"] = np.full(len(partition["symbol"]), date)
+            frames.append(pd.DataFrame(frame, columns=columns))
+
+        if not frames:
+            return pd.DataFrame({col: np.array([], dtype=float if col in self.COLUMNS else object) for col in columns})
+        return pd.concat(frames, ignore_index=True)
+
+    def history(self, symbol: str, start: str, end: str, columns: Optional[list] = None) -> pd.DataFrame:
+        """
+        Time series of one symbol between `start` and `end` (both included) in date order.
+        """
+        columns = columns or self.COLUMNS
+
+        dates, slices = [], []
+        for date in self.dates():
+            if not start <= date <= end:
+                continue
+            partition = self.partition(date)
+            left = np.searchsorted(partition["symbol"], symbol, side="left")
+            right = np.searchsorted(partition["symbol"], symbol, side="right")
+            if right > left:
+                dates += [date] * (right - left)
+                slices.append({col: partition[col][left:right] for col in columns})
+
+        result = pd.DataFrame({"date": dates, "symbol": symbol})
+        for col in columns:
+            result[col] = np.concatenate([i[col] for i in slices]) if slices else np.array([], dtype=float)
+        return result
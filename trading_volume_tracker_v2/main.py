@@ -1,3 +1,6 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime as dt
 from datetime import timedelta as td
 
@@ -9,10 +12,12 @@ from telegram.ext import Application, CommandHandler, ContextTypes
 class VolumeBot:
     BOT_KEY = "BOT_KEY"
     ADMIN_ID = "DAVID_CHAT_ID"
+    PLOT_WORKERS = 2
 
     def __init__(self):
         self.tools = Tools()
         self.creator = ImageCreator()
+        self.plot_pool = ProcessPoolExecutor(max_workers=self.PLOT_WORKERS)
 
     async def fill_missing_symbol(self, update: Update, context: ContextTypes) -> None:
         operator = update.effective_user
@@ -31,10 +36,13 @@ class VolumeBot:
         if self.tools.config[self.ADMIN_ID] != str(operator.id):
             return
         else:
-            self.tools.start()
+            volume = await asyncio.to_thread(self.tools.fill_mongodb, "volume")
+            listing = await asyncio.to_thread(self.tools.fill_mongodb, "listing")
             send_message(
                 token=self.tools.config[self.BOT_KEY],
-                message="Finish filling mongodb",
+                message=f"Finish filling mongodb\n"
+                f"Volume DB: {volume['rows']} rows, {volume['rows_per_sec']} rows/sec\n"
+                f"Listing DB: {listing['rows']} rows, {listing['rows_per_sec']} rows/sec",
                 chat_id=self.tools.config[self.ADMIN_ID],
             )
 
@@ -46,24 +54,39 @@ class VolumeBot:
             try:
                 currency = update.message.text.split(" ")[1].split(",")[0]
             except (IndexError, ValueError) as e:
-                update.message.reply_text("Please enter a valid currency. like: /get_volume BTC")
+                await update.message.reply_text("Please enter a valid currency. like: /get_volume BTC")
+                return
 
         days = 30
         start = (dt.today() - td(days=days)).strftime("%Y-%m-%d")
         end = dt.today().strftime("%Y-%m-%d")
-        volume = self.tools.get_historical_volume(currency, start=start, end=end)
-        fig_path = self.creator.volume_plot(currency, volume)
+        volume = await asyncio.to_thread(self.tools.get_historical_volume, currency, start=start, end=end)
+        if volume.empty:
+            await update.message.reply_text(f"No volume record of {currency} in the last {days} days")
+            return
+
+        # plots are cached by data version and rendered in the process pool, off the event loop
+        fig_path = self.creator.get_plot_path(currency, volume)
+        if not os.path.exists(fig_path):
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self.plot_pool, self.creator.volume_plot, currency, volume, fig_path)
         with open(fig_path, "rb") as f:
             await update.message.reply_photo(f)
 
+        # stale plots are pruned here, in the parent, never while a worker may be rendering or reading one
+        await asyncio.to_thread(self.creator.prune_plots)
+
     def run(self):
         application = Application.builder().token(self.tools.config[self.BOT_KEY]).build()
 
         application.add_handler(CommandHandler("fill_missing_symbol", self.fill_missing_symbol))
-        application.add_handler(CommandHandler("fill_mongodb", self.tools.fill_mongodb))
+        application.add_handler(CommandHandler("fill_mongodb", self.fill_mongodb))
         application.add_handler(CommandHandler("get_volume", self.get_volume))
 
-        application.run_polling()
+        try:
+            application.run_polling()
+        finally:
+            self.plot_pool.shutdown()
 
 
 if __name__ == "__main__":
@@ -1,8 +1,10 @@
+import asyncio
+import logging
 from datetime import datetime as dt
 from datetime import timedelta as td
 
 import pandas as pd
-from lib.utils import Formatter, Grabber, Tools, send_message
+from lib.utils import AsyncGrabber, Formatter, Grabber, Tools, send_message
 
 
 class ListingJob:
@@ -35,15 +37,16 @@ class ListingJob:
         woo_listing = grabber.get_woo_listing()
         listing_db = pd.concat([listing_db, woo_listing], axis=0)
 
-        # update to mongo DB
-        listing_mongo_db = tool.init_collection("TradingVolumeDB", "Listing")
-        exchange_lst = listing_db["Exchange"].unique().tolist()
-        for exchange in exchange_lst:
-            filter_ = {"Exchange": exchange}
-            listing_mongo_db.delete_many(filter_)
-            listing_mongo_db.insert_many(listing_db.query("Exchange == @exchange").to_dict("records"))
+        # apply only the changes to mongo DB
+        changes = tool.update_listing(listing_db)
 
-        send_message(token=bot_key, message=f"{dt.today().date()} FINISH LISTING DB RENEW", chat_id=chat_id)
+        send_message(
+            token=bot_key,
+            message=f"{dt.today().date()} FINISH LISTING DB RENEW\n"
+            f"Added: {changes['added']}\n"
+            f"Removed: {changes['removed']}",
+            chat_id=chat_id,
+        )
 
 
 class VolumeJob:
@@ -56,17 +59,76 @@ class VolumeJob:
         chat_id = self.config["DAVID_CHAT_ID"]
         send_message(token=bot_key, message=f"{dt.today().date()} START VOLUME DB RENEW", chat_id=chat_id)
 
-        grabber = Grabber()
+        grabber = AsyncGrabber()
         tools = Tools()
-        token_info = grabber.get_token_info(num=num).reset_index()
-
-        # update to mongo DB
-        volume_mongo_db = tools.init_collection("TradingVolumeDB", "Volume")
-        volume_mongo_db.insert_many(token_info.to_dict("records"))
+        date = dt.today().date().strftime("%Y-%m-%d")
+
+        # resume from the checkpoint of an interrupted run, finished tokens are saved chunk by chunk
+        done = tools.get_volume_checkpoint(date)
+        if not done:
+            tools.delete_volume_records(date)
+        saved = set(done)
+
+        def save(records):
+            tools.save_volume_records(records)
+            tools.update_volume_checkpoint(date, [i["slug"] for i in records])
+            saved.update(i["slug"] for i in records)
+
+        asyncio.run(grabber.crawl(num=num, done=done, on_chunk=save, chunk_size=tools.VOLUME_CHUNK_SIZE))
+
+        # ranks and percentages need the whole day, so they are written once every token is in, until then the
+        # checkpoint stays open and the next run resumes with the missing tokens
+        missing = [i for i in grabber.tokens["planned"] if i not in saved]
+        if not grabber.tokens["planned"] or missing:
+            logging.error(f"Volume of {date} incomplete, {len(missing)} tokens missing, left for the next run")
+            send_message(token=bot_key, message=f"{dt.today().date()} ABORT VOLUME DB RENEW", chat_id=chat_id)
+            return
+
+        token_info = grabber.add_volume_stats(tools.get_daily_volume(date))
+        tools.save_volume_records(token_info.to_dict("records"))
+        tools.update_volume_checkpoint(date, [], finished=True)
+        tools.update_weekly_volume(token_info)
+        tools.volume_store.write_partition(date, token_info)
 
         send_message(token=bot_key, message=f"{dt.today().date()} FINISH VOLUME DB RENEW", chat_id=chat_id)
 
 
+class AnomalyJob:
+    def __init__(self, config):
+        self.config = config
+        self.tools = Tools()
+        self.formatter = Formatter()
+        self.name = "AnomalyJob"
+
+    def run(self, date: str = None, cat: str = "total", num: int = 10, test: bool = False):
+        """
+        Alert on the tokens unlisted on WOO whose volume on `date` (%Y%m%d, today by default) is an outlier against
+        their trailing history, meant to run right after VolumeJob.
+        """
+        date = dt.strptime(date, "%Y%m%d") if date else dt.today()
+        date = date.strftime("%Y-%m-%d")
+
+        bot_key = self.config["BOT_KEY"]
+        chat_id = self.config["REPORT_CHAT_ID"] if not test else self.config["DAVID_CHAT_ID"]
+
+        anomalies = self.tools.get_volume_anomalies(date, cat)
+        if anomalies.empty:
+            logging.info(f"No volume anomaly on {date}")
+            return
+
+        anomalies = anomalies.iloc[:num].rename(
+            columns={"symbol": "Ccy", "volume": "Volume (USD)", "growth": "DoD (%)", "zscore": "Z-score"}
+        )
+        table = self.formatter.create_bt_from_df(anomalies, name="anomaly")
+        message = (
+            f"<b>VOLUME ANOMALY ALERT\n\n"
+            f"Date: {date}\n"
+            f"Category: {cat}\n\n</b>"
+            f"<a>Unlisted tokens with unusual volume:\n</a>{table}"
+        )
+        send_message(token=bot_key, message=message, chat_id=chat_id)
+
+
 class ReportJob:
     def __init__(self, config):
         self.config = config
@@ -75,12 +137,23 @@ class ReportJob:
         self.name = "ReportJob"
 
     def run(self, date: str, cat: str, num: int, test: bool = False):
+        """
+        param cat: total, spot, perpetual or all, `all` builds the report of every category from one read of the
+        weekly volume and listing, then sends them in order
+        """
         if date is None:
             date = (dt.today() - td(days=1)).date().strftime("%Y%m%d")
 
         bot_key = self.config["BOT_KEY"]
         chat_id = self.config["REPORT_CHAT_ID"] if not test else self.config["DAVID_CHAT_ID"]
 
+        cats = self.tools.REPORT_CATS if cat == "all" else [cat]
+        messages = [msg for i in cats for msg in self.create_messages(date, i, num)]
+
+        for msg in messages:
+            send_message(token=bot_key, message=msg, chat_id=chat_id)
+
+    def create_messages(self, date: str, cat: str, num: int) -> list:
         # top 10
         top_volume_tokens = self.tools.get_unlisted_token_with_top_volume(date, cat)
         tier1_tokens = top_volume_tokens.query("Tier == 1").iloc[:num].drop(columns=["Tier"])
@@ -107,8 +180,7 @@ class ReportJob:
 
         message2 = f"<a>2. New tokens in top 200 :\n" f"2.1 ⚠ Tier 1 ⚠:\n</a>" f"{new_tokens_table}"
 
-        for msg in [message, message2]:
-            send_message(token=bot_key, message=msg, chat_id=chat_id)
+        return [message, message2]
 
 
 class FillMongoDBJob:
@@ -121,13 +193,13 @@ class FillMongoDBJob:
         chat_id = self.config["DAVID_CHAT_ID"]
 
         tools = Tools()
-        volume_length = tools.fill_mongodb(fill_type="volume")
-        exchange_length = tools.fill_mongodb(fill_type="listing")
+        volume = tools.fill_mongodb(fill_type="volume")
+        listing = tools.fill_mongodb(fill_type="listing")
 
         send_message(
             token=bot_key,
             message=f"{dt.today().date()} FINISH FILLING MONGODB\n"
-            f"Volume DB: {volume_length} dates\n"
-            f"Exchange DB: {exchange_length} exchanges",
+            f"Volume DB: {volume['rows']} rows, {len(volume['dates'])} dates, {volume['rows_per_sec']} rows/sec\n"
+            f"Listing DB: {listing['rows']} rows, {listing['rows_per_sec']} rows/sec",
             chat_id=chat_id,
         )
@@ -0,0 +1,106 @@
+import asyncio
+from unittest import mock
+
+import pytest
+from lib.utils import AsyncGrabber, BaseClient, RateGovernor
+
+
+@pytest.fixture
+def grabber() -> AsyncGrabber:
+    with mock.patch.object(BaseClient, "_init_config", lambda self: {AsyncGrabber.CMC_API_KEY: ""}):
+        grabber = AsyncGrabber()
+    grabber._fetch = mock.AsyncMock(return_value={"data": {}})
+    return grabber
+
+
+def test_get_reuses_responses_for_the_run(grabber):
+    async def run():
+        grabber._start_run()
+        first = await grabber._get(None, "https://api.coinmarketcap.com/page", params={"start": 1})
+        second = await grabber._get(None, "https://api.coinmarketcap.com/page", params={"start": 1})
+        other = await grabber._get(None, "https://api.coinmarketcap.com/page", params={"start": 1001})
+        return first, second, other
+
+    first, second, other = asyncio.run(run())
+
+    assert first is second
+    assert grabber._fetch.await_count == 2
+    assert grabber.requests["reused"] == 1
+    assert len(grabber.responses) == 2
+
+
+def test_crawl_clears_the_memo(grabber):
+    async def plan_run(session, num):
+        await grabber._get(session, grabber.KEY_INFO_URL)
+        return 0
+
+    grabber._plan_run = plan_run
+    result = asyncio.run(grabber.crawl(num=10))
+
+    assert result.empty
+    assert grabber._fetch.await_count == 1
+    assert grabber.responses == {}
+
+
+class Response:
+    def __init__(self, body):
+        self.status = 200
+        self.headers = {}
+        self.body = body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    async def json(self, content_type=None):
+        if isinstance(self.body, Exception):
+            raise self.body
+        return self.body
+
+
+def fetch(grabber: AsyncGrabber, bodies: list):
+    session = mock.Mock()
+    session.get.side_effect = [Response(i) for i in bodies]
+
+    async def run():
+        grabber._start_run()
+        with mock.patch("asyncio.sleep", mock.AsyncMock()):
+            return await AsyncGrabber._fetch(grabber, session, "https://api.coinmarketcap.com/page")
+
+    return asyncio.run(run()), session
+
+
+def test_fetch_retries_a_non_json_body(grabber):
+    response, session = fetch(grabber, [ValueError("<html>502</html>"), {"data": {}}])
+
+    assert response == {"data": {}}
+    assert session.get.call_count == 2
+
+
+def test_fetch_gives_up_with_none(grabber):
+    response, session = fetch(grabber, [ValueError("<html>502</html>")] * (grabber.MAX_RETRIES + 1))
+
+    assert response is None
+    assert session.get.call_count == grabber.MAX_RETRIES + 1
+
+
+def test_fetch_keeps_one_governor_per_api(grabber):
+    session = mock.Mock()
+    session.get.side_effect = lambda *args, **kwargs: Response({"data": {}})
+
+    async def run():
+        grabber._start_run()
+        with mock.patch("lib.utils.RateGovernor", wraps=RateGovernor) as governor:
+            for url in ["https://api.example.com/v1/a", "https://api.example.com/v1/b", "https://api.example.com/v1/a"]:
+                await AsyncGrabber._fetch(grabber, session, url)
+        return governor
+
+    governor = asyncio.run(run())
+
+    assert governor.call_count == 1
+    assert (
+        grabber.governors[grabber._api("https://api.example.com/v1/a")]
+        is grabber.governors[grabber._api("https://api.example.com/v1/b")]
+    )
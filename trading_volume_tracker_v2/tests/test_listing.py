@@ -0,0 +1,34 @@
+from unittest import mock
+
+import mongomock
+import pytest
+from lib.utils import BaseClient, Tools
+
+LISTING = [
+    {"exchange": "WOO", "symbol": "BTC", "type": "spot"},
+    {"exchange": "WOO", "symbol": "ETH", "type": "perpetual"},
+    {"exchange": "binance", "symbol": "SOL", "type": "spot"},
+]
+
+
+@pytest.fixture
+def tools(tmp_path) -> Tools:
+    client = mongomock.MongoClient()
+    client["TradingVolumeDB"]["ListingInfo"].insert_many([dict(i) for i in LISTING])
+    with (
+        mock.patch.object(BaseClient, "_init_config", lambda self: {Tools.MONGO_URL: ""}),
+        mock.patch.object(Tools, "init_mongo_client", lambda self: client),
+        mock.patch.object(Tools, "VOLUME_STORE_PATH", str(tmp_path)),
+    ):
+        yield Tools()
+
+
+@pytest.mark.parametrize("cat", [None, "all", "total"])
+def test_exchange_listing_of_every_category(tools, cat):
+    assert sorted(tools._get_exchange_listing("WOO", cat)) == ["BTC", "ETH"]
+
+
+def test_exchange_listing_of_one_category(tools):
+    assert tools._get_exchange_listing("WOO", "spot") == ["BTC"]
+    assert tools._get_exchange_listing("WOO", "perpetual") == ["ETH"]
+    assert tools._get_exchange_listing("binance", "perpetual") == []
@@ -2,11 +2,12 @@ import asyncio
 import os
 
 import pandas as pd
-from beautifultable import BeautifulTable
 from cex_adaptors.binance import Binance
 from dotenv import load_dotenv
 from telegram import Bot
 
+from common.table import pre_table
+
 load_dotenv()
 
 
@@ -59,19 +60,20 @@ class Monitor:
         return last_prices
 
     def get_exposure_message(self, exposure: pd.DataFrame, margin_value: float) -> str:
-        # get exposure table with beautiful Table
+        # get exposure table
         datetime = pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")
-        table = BeautifulTable()
-        table.columns.header = ["Currency", "Balance", "Last Price", "Value"]
-        for _, row in exposure.iterrows():
-            table.rows.append([row["currency"], row["balance"], row["lp"], row["value"]])
+        table = pre_table(
+            exposure[["currency", "balance", "lp", "value"]],
+            header=["Currency", "Balance", "Last Price", "Value"],
+            style="default",
+        )
 
         final_message = f"""
         <b>Binance Margin Account Exposure</b>\n
 <b>Time:</b> <code>{datetime}</code>\n
 <b>Margin Value:</b> <code>{round(margin_value, 2)} USDT</code>\n
 <b>Top 5 Exposure:</b>\n
-        <pre>{table}</pre>
+        {table}
         """
         return final_message
 